@@ -0,0 +1,226 @@
+"""
+Reference transforms benchmarked next to submissions. The codec is picked
+with the CODEC environment variable (set as a build arg per image) and the
+command line matches what the benchmark runs for submissions:
+
+    python -u main.py <input> <output> --mode=encode|decode
+"""
+
+import argparse
+import json
+import os
+import zlib
+
+import numpy as np
+import zstandard
+
+
+def zigzag(values: np.ndarray) -> np.ndarray:
+    return ((values << 1) ^ (values >> 63)).astype(np.uint64)
+
+
+def unzigzag(values: np.ndarray) -> np.ndarray:
+    values = values.astype(np.uint64)
+    return ((values >> np.uint64(1)).astype(np.int64)) ^ -(
+        (values & np.uint64(1)).astype(np.int64)
+    )
+
+
+def pack_unsigned(values: np.ndarray) -> tuple[bytes, str]:
+    # Narrowest unsigned type that holds every value
+    peak = int(values.max()) if values.size else 0
+    for dtype in (np.uint8, np.uint16, np.uint32, np.uint64):
+        if peak <= np.iinfo(dtype).max:
+            return values.astype(dtype).tobytes(), np.dtype(dtype).str
+    raise ValueError("Value out of range")
+
+
+def encode_raw(values: np.ndarray, meta: dict) -> bytes:
+    return values.tobytes()
+
+
+def decode_raw(payload: bytes, meta: dict) -> np.ndarray:
+    return np.frombuffer(payload, dtype=meta["dtype"])
+
+
+def encode_zlib(values: np.ndarray, meta: dict) -> bytes:
+    return zlib.compress(values.tobytes(), 6)
+
+
+def decode_zlib(payload: bytes, meta: dict) -> np.ndarray:
+    return np.frombuffer(zlib.decompress(payload), dtype=meta["dtype"])
+
+
+def zstd_codec(level: int):
+    def encode(values: np.ndarray, meta: dict) -> bytes:
+        return zstandard.ZstdCompressor(level=level).compress(values.tobytes())
+
+    def decode(payload: bytes, meta: dict) -> np.ndarray:
+        data = zstandard.ZstdDecompressor().decompress(payload)
+        return np.frombuffer(data, dtype=meta["dtype"])
+
+    return encode, decode
+
+
+def encode_linear(values: np.ndarray, meta: dict) -> bytes:
+    # Numpress linear: fixed point, second-order linear prediction residuals
+    values = values.astype(np.float64)
+    peak = float(np.abs(values).max()) if values.size else 0.0
+    fixed_point = np.floor(0x7FFFFFFF / peak) if peak > 0 else 1.0
+    meta["fixed_point"] = fixed_point
+    ints = np.round(values * fixed_point).astype(np.int64)
+    residuals = np.diff(np.diff(ints, prepend=0), prepend=0)
+    packed, meta["packed_dtype"] = pack_unsigned(zigzag(residuals))
+    return zlib.compress(packed, 6)
+
+
+def decode_linear(payload: bytes, meta: dict) -> np.ndarray:
+    residuals = unzigzag(
+        np.frombuffer(zlib.decompress(payload), dtype=meta["packed_dtype"])
+    )
+    ints = np.cumsum(np.cumsum(residuals))
+    return ints / meta["fixed_point"]
+
+
+def encode_slof(values: np.ndarray, meta: dict) -> bytes:
+    # Numpress short logged float: log-scaled 16-bit fixed point
+    logged = np.log1p(np.clip(values.astype(np.float64), 0, None))
+    peak = float(logged.max()) if logged.size else 0.0
+    fixed_point = np.floor(0xFFFF / peak) if peak > 0 else 1.0
+    meta["fixed_point"] = fixed_point
+    return zlib.compress(np.round(logged * fixed_point).astype(np.uint16).tobytes(), 6)
+
+
+def decode_slof(payload: bytes, meta: dict) -> np.ndarray:
+    ints = np.frombuffer(zlib.decompress(payload), dtype=np.uint16)
+    return np.expm1(ints / meta["fixed_point"])
+
+
+def encode_pic(values: np.ndarray, meta: dict) -> bytes:
+    # Numpress positive integer compression: round to integer counts
+    ints = np.round(np.clip(values.astype(np.float64), 0, None)).astype(np.int64)
+    packed, meta["packed_dtype"] = pack_unsigned(zigzag(ints))
+    return zlib.compress(packed, 6)
+
+
+def decode_pic(payload: bytes, meta: dict) -> np.ndarray:
+    packed = np.frombuffer(zlib.decompress(payload), dtype=meta["packed_dtype"])
+    return unzigzag(packed).astype(np.float64)
+
+
+# Shortest strictly ascending run treated as an m/z array in the flat layout
+MZ_MIN_RUN = 4
+
+
+def mz_mask(array: np.ndarray) -> np.ndarray:
+    """
+    Which values, in ravel order, are m/z. Two-channel layouts are split by
+    axis. The flat layout (every binary array in document order) is split by
+    value: m/z arrays are strictly ascending, so ascending runs of at least
+    MZ_MIN_RUN points count as m/z. Intensities that happen to rise just
+    skip the lossy step.
+    """
+    if array.ndim == 2 and 2 in array.shape:
+        mask = np.zeros(array.shape, dtype=bool)
+        if array.shape[0] == 2:
+            mask[0] = True
+        else:
+            mask[:, 0] = True
+        return mask.ravel()
+    values = array.ravel()
+    run_starts = np.flatnonzero(np.concatenate(([True], np.diff(values) <= 0)))
+    run_lengths = np.diff(np.append(run_starts, values.size))
+    return np.repeat(run_lengths >= MZ_MIN_RUN, run_lengths)
+
+
+def channel_codec(encode_intensity, decode_intensity):
+    # As in numpress, slof and pic only apply to intensities; m/z goes
+    # through linear prediction so its precision is kept
+    def encode(values: np.ndarray, meta: dict) -> bytes:
+        mask = mz_mask(values.reshape(meta["shape"]))
+        meta["mz"], meta["intensity"] = {}, {}
+        sections = [
+            zlib.compress(np.packbits(mask).tobytes(), 6),
+            encode_linear(values[mask], meta["mz"]),
+            encode_intensity(values[~mask], meta["intensity"]),
+        ]
+        meta["sections"] = [len(section) for section in sections]
+        return b"".join(sections)
+
+    def decode(payload: bytes, meta: dict) -> np.ndarray:
+        offsets = np.cumsum([0] + meta["sections"])
+        mask_data, mz_data, intensity_data = (
+            payload[start:end] for start, end in zip(offsets[:-1], offsets[1:])
+        )
+        count = int(np.prod(meta["shape"]))
+        mask = np.unpackbits(
+            np.frombuffer(zlib.decompress(mask_data), dtype=np.uint8), count=count
+        ).astype(bool)
+        values = np.empty(count, dtype=np.float64)
+        values[mask] = decode_linear(mz_data, meta["mz"])
+        values[~mask] = decode_intensity(intensity_data, meta["intensity"])
+        return values
+
+    return encode, decode
+
+
+def truncate_codec(mantissa_bits: int):
+    # Cast to float32 and zero the low mantissa bits before zlib
+    mask = np.uint32((0xFFFFFFFF << (23 - mantissa_bits)) & 0xFFFFFFFF)
+
+    def encode(values: np.ndarray, meta: dict) -> bytes:
+        truncated = values.astype(np.float32).view(np.uint32) & mask
+        return zlib.compress(truncated.tobytes(), 6)
+
+    def decode(payload: bytes, meta: dict) -> np.ndarray:
+        return np.frombuffer(zlib.decompress(payload), dtype=np.float32)
+
+    return encode, decode
+
+
+CODECS = {
+    "raw": (encode_raw, decode_raw),
+    "zlib": (encode_zlib, decode_zlib),
+    "zstd-1": zstd_codec(1),
+    "zstd-3": zstd_codec(3),
+    "zstd-9": zstd_codec(9),
+    "zstd-19": zstd_codec(19),
+    "numpress-linear": (encode_linear, decode_linear),
+    "numpress-slof": channel_codec(encode_slof, decode_slof),
+    "numpress-pic": channel_codec(encode_pic, decode_pic),
+    "truncate-f32": truncate_codec(23),
+    "truncate-m10": truncate_codec(10),
+}
+
+
+def encode(codec: str, input_path: str, output_path: str):
+    array = np.load(input_path, allow_pickle=False)
+    meta = {"codec": codec, "dtype": array.dtype.str, "shape": list(array.shape)}
+    payload = CODECS[codec][0](np.ascontiguousarray(array).ravel(), meta)
+    with open(output_path, "wb") as f:
+        f.write(json.dumps(meta).encode("utf-8") + b"\n")
+        f.write(payload)
+
+
+def decode(codec: str, input_path: str, output_path: str):
+    with open(input_path, "rb") as f:
+        meta = json.loads(f.readline())
+        payload = f.read()
+    values = CODECS[codec][1](payload, meta)
+    array = np.asarray(values).astype(meta["dtype"]).reshape(meta["shape"])
+    with open(output_path, "wb") as f:
+        np.save(f, array)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("input")
+    parser.add_argument("output")
+    parser.add_argument("--mode", choices=["encode", "decode"], required=True)
+    args = parser.parse_args()
+
+    codec = os.environ.get("CODEC", "raw")
+    if args.mode == "encode":
+        encode(codec, args.input, args.output)
+    else:
+        decode(codec, args.input, args.output)
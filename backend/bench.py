@@ -0,0 +1,144 @@
+"""
+Offline benchmark harness. Runs the encode/decode/compare pipeline for a
+local transform directory without Postgres, Redis, MinIO or Docker: objects
+live in a local directory, "containers" are subprocesses and results go to
+SQLite.
+
+    python bench.py path/to/transform path/to/test.npy --runs 5
+
+The transform directory is used as-is (its dependencies must be installed
+in the current environment) and is invoked with the same command line as
+the Docker image built from a submission.
+"""
+
+import argparse
+import os
+import sys
+import time
+import shutil
+from collections import defaultdict
+from tempfile import mkdtemp
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("transform_dir", help="Directory containing main.py")
+    parser.add_argument("input", help="Deconstructed .npy benchmark input")
+    parser.add_argument("--runs", type=int, default=5, help="Timed runs per mode")
+    parser.add_argument(
+        "--workdir", help="Directory for objects, scratch and the SQLite database"
+    )
+    parser.add_argument(
+        "--keep", action="store_true", help="Keep the work directory afterwards"
+    )
+    return parser.parse_args()
+
+
+def compare_arrays(original_file: str, new_file: str) -> dict:
+    # Offline stand-in for the MSFragger search + pats-compare stages
+    import numpy as np
+
+    original = np.load(original_file, allow_pickle=False)
+    new = np.load(new_file, allow_pickle=False)
+    if original.shape != new.shape:
+        return {"shape_match": False}
+    original = original.astype(np.float64)
+    error = np.abs(new.astype(np.float64) - original)
+    relative = error / np.maximum(np.abs(original), np.finfo(np.float64).tiny)
+    return {
+        "shape_match": True,
+        "max_abs_error": float(error.max()) if error.size else 0.0,
+        "max_rel_error": float(relative.max()) if relative.size else 0.0,
+        "mean_rel_error": float(relative.mean()) if relative.size else 0.0,
+    }
+
+
+def print_table(title: str, rows: list[tuple]):
+    print(f"\n{title}")
+    width = max(len(str(row[0])) for row in rows)
+    for row in rows:
+        print(f"  {str(row[0]).ljust(width)}  " + "  ".join(str(v) for v in row[1:]))
+
+
+def main():
+    args = parse_args()
+    workdir = os.path.abspath(args.workdir or mkdtemp(prefix="mecs-bench-"))
+    os.makedirs(workdir, exist_ok=True)
+
+    # Backends are selected before any backend module is imported
+    os.environ.setdefault("DATABASE_URL", f"sqlite:///{workdir}/bench.db")
+    os.environ.setdefault("SCRATCH_DIR", os.path.join(workdir, "scratch"))
+
+    from utils.backends import LocalObjectStore, SubprocessContainerRunner
+    from utils.minio import minio_client, RUN_BUCKET
+    from utils.docker import docker_client
+
+    image = f"local-{os.path.basename(os.path.abspath(args.transform_dir))}".lower()
+    minio_client.override(LocalObjectStore(os.path.join(workdir, "objects")))
+    docker_client.override(
+        SubprocessContainerRunner({f"transform-{image}": args.transform_dir})
+    )
+
+    from models.schema import Submission, TestResult
+    from utils.database import session_scope, init_db
+    from utils.scratch import fetch_intermediate
+    from utils.telemetry import record_stages
+    from process import encode_benchmark
+
+    init_db()
+    with session_scope() as db_session:
+        if not db_session.query(Submission).filter_by(file_key=image).first():
+            db_session.add(
+                Submission(
+                    file_key=image, email="local@localhost", name="local", submission_name=image
+                )
+            )
+            db_session.commit()
+
+        minio_client.fput_object(RUN_BUCKET, "init/deconstruct/test.npy", args.input)
+
+        with record_stages() as timings:
+            start_time = time.perf_counter()
+            encode_benchmark(image, RUN_BUCKET, "test.npy", db_session, num_runs=args.runs)
+            total_time = time.perf_counter() - start_time
+
+        new_npy = os.path.join(workdir, "new.npy")
+        fetch_intermediate(RUN_BUCKET, f"{image}/new.npy", new_npy)
+        accuracy = compare_arrays(args.input, new_npy)
+
+        result = db_session.query(TestResult).filter_by(submission_id=image).first()
+        print_table(
+            "Results",
+            [
+                ("encoding_runtime (s)", result.encoding_runtime),
+                ("decoding_runtime (s)", result.decoding_runtime),
+                ("ratio", result.ratio),
+                ("encoding_throughput (MB/s)", result.encoding_throughput),
+                ("decoding_throughput (MB/s)", result.decoding_throughput),
+                ("bits_per_point", result.bits_per_point),
+                ("efficiency", result.efficiency),
+                *accuracy.items(),
+            ],
+        )
+
+        stage_totals = defaultdict(lambda: [0, 0.0])
+        for name, duration in timings:
+            stage_totals[name][0] += 1
+            stage_totals[name][1] += duration
+        timed = sum(
+            total for name, (_, total) in stage_totals.items() if name.endswith("_run")
+        )
+        print_table(
+            "Stages (count, total s)",
+            [(name, count, f"{total:.4f}") for name, (count, total) in stage_totals.items()]
+            + [("harness overhead", "", f"{total_time - timed:.4f}")],
+        )
+
+    if args.keep:
+        print(f"\nWork directory: {workdir}")
+    elif not args.workdir:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
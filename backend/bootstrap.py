@@ -0,0 +1,47 @@
+"""
+One-shot setup of everything the API and workers expect to exist: database
+tables, MinIO buckets and the benchmark inputs (downloaded, deconstructed and
+searched by the workers) plus the reference baselines.
+
+    python bootstrap.py
+
+Safe to run repeatedly; every step skips work that is already done. Run it
+once per deployment instead of on every API start.
+"""
+
+import os
+import sys
+import logging
+from celery import chain
+from dotenv import load_dotenv
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+load_dotenv()
+
+
+def main():
+    from utils.database import init_db
+    from utils.minio import initialize_buckets, BUCKETS
+    from tasks import prepare_benchmarks, prepare_baselines
+
+    init_db()
+    logger.info("Database tables created successfully.")
+
+    initialize_buckets(BUCKETS)
+    logger.info(f"Buckets initialized: {', '.join(BUCKETS)}.")
+
+    # Download test file (if not exists)
+    mzml_file = os.environ.get("TEST_MZML")
+    mzml_file_url = os.environ.get("TEST_MZML_URL")
+    logger.info(f"mzml_file: {mzml_file}")
+    task = chain(
+        prepare_benchmarks.si(url=mzml_file_url, object_name=mzml_file),
+        prepare_baselines.si(),
+    ).apply_async()
+    logger.info(f"Initialization task ID: {task.id}")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
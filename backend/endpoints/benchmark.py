@@ -1,60 +1,34 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, Depends, HTTPException
 from fastapi.responses import StreamingResponse
-from io import BytesIO
-from utils.minio import minio_client, BUCKET_NAME, CONTAINER_BUCKET
-from utils.docker import save_and_push_internal_image
+from sqlalchemy.orm import Session
+from utils.docker import docker_client, save_and_push_internal_image
+from utils.database import get_db
+from utils.watchdog import kill_submission_containers
+from utils.artifacts import InvalidSubmission, load_build_context
+from models.schema import TestResult
+from minio.error import S3Error
 from tasks import benchmark_image
-from zipfile import ZipFile
 import logging
-import tarfile
 import asyncio
 import docker
 
-docker_client = docker.APIClient()
-
 router = APIRouter()
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 
-def create_transform_tar(zip_data: BytesIO) -> BytesIO:
-    tar_data = BytesIO()
-    with ZipFile(zip_data) as z:
-        if not any(info.filename.startswith("transform/") for info in z.infolist()):
-            # Check if transform directory is present
-            return None
-
-        # Create a tar archive for the "transform" directory
-        with tarfile.open(fileobj=tar_data, mode="w") as tar:
-            for file_info in z.infolist():
-                if file_info.filename.startswith("transform/"):
-                    relative_path = file_info.filename[len("transform/"):]
-                    # Skip the __pycache__ folder and its contents
-                    if relative_path.split("/")[0] == "__pycache__":
-                        continue
-
-                    file_bytes = z.read(file_info)
-                    tar_info = tarfile.TarInfo(name=relative_path)
-                    tar_info.size = len(file_bytes)
-                    tar.addfile(tar_info, BytesIO(file_bytes))
-        tar_data.seek(0)
-        return tar_data
-
-
 @router.post("/build-container/{file_key}")
-async def build_container(file_key: str):
-    response = minio_client.get_object(BUCKET_NAME, file_key)
-    zip_data = BytesIO(response.read())  # Read in-memory
-    response.close()
-    response.release_conn()
-
-    tar_data = create_transform_tar(zip_data)
-
-    if tar_data is None:
-        raise HTTPException(
-            status_code=400, detail="Error in extracting uploaded zip."
-        )
+async def build_container(file_key: str, db: Session = Depends(get_db)):
+    # Build context prepared at upload time
+    try:
+        tar_data = load_build_context(db, file_key)
+    except InvalidSubmission as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except S3Error as e:
+        if e.code != "NoSuchKey":
+            raise
+        raise HTTPException(status_code=404, detail="File not found in MinIO bucket")
 
     async def log_stream():
         yield "Starting build...\n"
@@ -96,4 +70,25 @@ async def build_container(file_key: str):
 async def run_benchmark(image: str):
     task = benchmark_image.apply_async(args=[image])
 
-    return {"task_id": task.id}
\ No newline at end of file
+    return {"task_id": task.id}
+
+
+@router.post("/benchmark/{image}/cancel")
+def cancel_benchmark(image: str, db: Session = Depends(get_db)):
+    test_result = db.query(TestResult).filter_by(submission_id=image).first()
+
+    if not test_result:
+        raise HTTPException(status_code=404, detail="Result not found")
+    if test_result.status != "pending":
+        raise HTTPException(
+            status_code=409, detail="Benchmark is not queued or running."
+        )
+
+    # Queued tasks skip cancelled submissions; running ones stop once their
+    # container is killed.
+    test_result.status = "cancelled"
+    db.commit()
+    containers_killed = kill_submission_containers(image)
+    logger.info(f"Cancelled benchmark for {image}, killed {containers_killed} containers.")
+
+    return {"submission_id": image, "status": "cancelled", "containers_killed": containers_killed}
\ No newline at end of file
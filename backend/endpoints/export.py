@@ -0,0 +1,193 @@
+import os
+import csv
+from io import StringIO
+from typing import Literal, Optional
+import pyarrow as pa
+import pyarrow.parquet as pq
+from fastapi import APIRouter, Query
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select, func, case, or_
+from models.schema import Submission, TestResult
+from utils.database import session_scope
+
+# Rows fetched from the server-side cursor, and written, per batch
+EXPORT_BATCH_SIZE = int(os.environ.get("EXPORT_BATCH_SIZE", 1000))
+
+MEDIA_TYPES = {
+    "csv": "text/csv",
+    "arrow": "application/vnd.apache.arrow.stream",
+    "parquet": "application/vnd.apache.parquet",
+}
+
+router = APIRouter()
+
+_is_baseline = Submission.is_baseline.is_(True)
+_leaderboard = [TestResult.dataset, _is_baseline]
+
+
+def _rank(column, descending: bool = False):
+    # Same ranking as /rank, per dataset: reference codecs and missing values
+    # are not ranked
+    ranked = func.rank().over(
+        partition_by=_leaderboard,
+        order_by=[column.is_(None), column.desc() if descending else column],
+    )
+    return case((or_(_is_baseline, column.is_(None)), None), else_=ranked)
+
+
+def _export_columns() -> list[tuple]:
+    # (name, expression, Arrow type), in output order
+    return [
+        ("submission_id", Submission.file_key, pa.string()),
+        ("name", Submission.name, pa.string()),
+        ("submission_name", Submission.submission_name, pa.string()),
+        ("round", Submission.round, pa.string()),
+        ("baseline", _is_baseline, pa.bool_()),
+        ("dataset", TestResult.dataset, pa.string()),
+        ("status", TestResult.status, pa.string()),
+        ("encoding_runtime", TestResult.encoding_runtime, pa.float64()),
+        ("decoding_runtime", TestResult.decoding_runtime, pa.float64()),
+        ("ratio", TestResult.ratio, pa.float64()),
+        ("accuracy", TestResult.accuracy, pa.float64()),
+        (
+            "peptide_percent_preserved",
+            TestResult.peptide_percent_preserved,
+            pa.float64(),
+        ),
+        ("peptide_percent_missed", TestResult.peptide_percent_missed, pa.float64()),
+        ("peptide_percent_new", TestResult.peptide_percent_new, pa.float64()),
+        ("encoding_throughput", TestResult.encoding_throughput, pa.float64()),
+        ("decoding_throughput", TestResult.decoding_throughput, pa.float64()),
+        ("bits_per_point", TestResult.bits_per_point, pa.float64()),
+        ("mz_bits_per_point", TestResult.mz_bits_per_point, pa.float64()),
+        (
+            "intensity_bits_per_point",
+            TestResult.intensity_bits_per_point,
+            pa.float64(),
+        ),
+        ("efficiency", TestResult.efficiency, pa.float64()),
+        ("encoding_runtime_rank", _rank(TestResult.encoding_runtime), pa.int64()),
+        ("decoding_runtime_rank", _rank(TestResult.decoding_runtime), pa.int64()),
+        ("ratio_rank", _rank(TestResult.ratio, descending=True), pa.int64()),
+        ("accuracy_rank", _rank(TestResult.accuracy, descending=True), pa.int64()),
+        (
+            "total_entries",
+            case(
+                (_is_baseline, None),
+                else_=func.count().over(partition_by=_leaderboard),
+            ),
+            pa.int64(),
+        ),
+    ]
+
+
+class _ChunkSink:
+    """
+    Write-only file that hands out what was written since the last drain, so
+    Arrow and Parquet writers can be streamed without buffering the file.
+    """
+
+    def __init__(self):
+        self._chunks = []
+        self._position = 0
+        self.closed = False
+
+    def write(self, data) -> int:
+        data = bytes(data)
+        self._chunks.append(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def _record_batch(rows, schema: pa.Schema) -> pa.RecordBatch:
+    columns = zip(*rows)
+    return pa.RecordBatch.from_arrays(
+        [pa.array(values, type=field.type) for values, field in zip(columns, schema)],
+        schema=schema,
+    )
+
+
+def _write_csv(batches, names: list[str]):
+    buffer = StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(names)
+    for rows in batches:
+        writer.writerows(rows)
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+    yield buffer.getvalue().encode()
+
+
+def _write_columnar(batches, schema: pa.Schema, export_format: str):
+    sink = _ChunkSink()
+    output = pa.PythonFile(sink, mode="w")
+    if export_format == "parquet":
+        writer = pq.ParquetWriter(output, schema)
+    else:
+        writer = pa.ipc.new_stream(output, schema)
+    for rows in batches:
+        # One record batch or Parquet row group per cursor batch
+        writer.write_batch(_record_batch(rows, schema))
+        yield sink.drain()
+    writer.close()
+    yield sink.drain()
+
+
+def _export_rows(competition_round: Optional[str], export_format: str):
+    columns = _export_columns()
+    statement = (
+        select(*[expression.label(name) for name, expression, _ in columns])
+        .select_from(TestResult)
+        .join(Submission)
+        .order_by(_is_baseline.desc(), TestResult.dataset, TestResult.id)
+    )
+    if competition_round is not None:
+        # Reference codecs are part of every round
+        statement = statement.where(
+            or_(Submission.round == competition_round, _is_baseline)
+        )
+
+    # The session lives as long as the response is streamed; yield_per reads
+    # through a server-side cursor instead of loading every row
+    with session_scope() as db:
+        result = db.execute(statement.execution_options(yield_per=EXPORT_BATCH_SIZE))
+        batches = (
+            [tuple(row) for row in partition] for partition in result.partitions()
+        )
+        if export_format == "csv":
+            yield from _write_csv(batches, [name for name, _, _ in columns])
+        else:
+            schema = pa.schema([(name, arrow_type) for name, _, arrow_type in columns])
+            yield from _write_columnar(batches, schema, export_format)
+
+
+@router.get("/export")
+def export_results(
+    format: Literal["csv", "arrow", "parquet"] = "csv",
+    competition_round: Optional[str] = Query(None, alias="round"),
+):
+    # All results with ranks for notebooks, streamed instead of built in memory
+    file_name = f"results-{competition_round}" if competition_round else "results"
+    extension = "arrows" if format == "arrow" else format
+    return StreamingResponse(
+        _export_rows(competition_round, format),
+        media_type=MEDIA_TYPES[format],
+        headers={
+            "Content-Disposition": f'attachment; filename="{file_name}.{extension}"'
+        },
+    )
@@ -0,0 +1,46 @@
+from fastapi import APIRouter
+from fastapi.responses import JSONResponse
+from process import deconstruct_exists, search_exists
+from utils.minio import RUN_BUCKET
+import time
+import logging
+
+router = APIRouter()
+
+logger = logging.getLogger(__name__)
+
+# Seconds between MinIO checks while benchmark inputs are still being prepared.
+# Once everything is ready the result is kept for the life of the process.
+READY_RECHECK_INTERVAL = 10
+
+_ready_cache = {"checked_at": 0.0, "body": None}
+
+
+def check_benchmark_inputs() -> dict:
+    try:
+        inputs = {
+            "deconstruct": deconstruct_exists(RUN_BUCKET, "init"),
+            "search": search_exists(RUN_BUCKET, "init"),
+        }
+        return {"ready": all(inputs.values()), "inputs": inputs}
+    except Exception as e:
+        logger.error(f"Failed to check benchmark inputs: {e}")
+        return {"ready": False, "error": str(e)}
+
+
+@router.get("/health")
+def get_health():
+    # Liveness only; never touches the database, MinIO or Docker
+    return {"status": "ok"}
+
+
+@router.get("/ready")
+def get_ready():
+    body = _ready_cache["body"]
+    now = time.monotonic()
+    if body is None or (
+        not body["ready"] and now - _ready_cache["checked_at"] > READY_RECHECK_INTERVAL
+    ):
+        body = check_benchmark_inputs()
+        _ready_cache.update(checked_at=now, body=body)
+    return JSONResponse(content=body, status_code=200 if body["ready"] else 503)
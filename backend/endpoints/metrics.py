@@ -0,0 +1,51 @@
+from fastapi import APIRouter, Response
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    generate_latest,
+    multiprocess,
+)
+from prometheus_client.core import GaugeMetricFamily
+from utils.telemetry import PROMETHEUS_MULTIPROC_DIR
+from utils.workers import queue_depths
+from tasks import celery_app
+import logging
+
+router = APIRouter()
+
+logger = logging.getLogger(__name__)
+
+
+class QueueDepthCollector:
+    """
+    Reports the number of messages waiting in each Celery queue at scrape time.
+    """
+
+    def collect(self):
+        gauge = GaugeMetricFamily(
+            "mecs_queue_depth", "Messages waiting in each Celery queue.", labels=["queue"]
+        )
+        for queue in celery_app.conf.task_queues:
+            # One failing queue must not drop the others from the scrape
+            try:
+                message_count = queue_depths(celery_app, [queue.name])[queue.name]
+            except Exception as e:
+                logger.error(f"Failed to read depth of queue {queue.name}: {e}")
+                message_count = 0
+            gauge.add_metric([queue.name], message_count)
+        yield gauge
+
+
+@router.get("/metrics")
+def get_metrics():
+    registry = CollectorRegistry()
+    if PROMETHEUS_MULTIPROC_DIR:
+        # Aggregate the samples of every API process; workers serve their own
+        multiprocess.MultiProcessCollector(registry)
+    registry.register(QueueDepthCollector())
+
+    output = generate_latest(registry)
+    if not PROMETHEUS_MULTIPROC_DIR:
+        output = generate_latest(REGISTRY) + output
+    return Response(content=output, media_type=CONTENT_TYPE_LATEST)
@@ -1,19 +1,25 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
+from fastapi.responses import JSONResponse
 from typing import List
 from sqlalchemy import func, case
 from sqlalchemy.orm import Session
 from models.models import ResultModel, RankModel
 from models.schema import Submission, TestResult
 from utils.database import get_db
-from utils.minio import minio_client
-from io import BytesIO
-import zipfile
+from utils.artifacts import InvalidSubmission, backfill_artifacts
+from minio.error import S3Error
 
 router = APIRouter()
 
 @router.get("/results", response_model=List[ResultModel])
 def get_all_results(db: Session = Depends(get_db)):
-    results = db.query(TestResult).join(Submission).all()
+    # Reference codecs first so they stay pinned above the submissions
+    results = (
+        db.query(TestResult)
+        .join(Submission)
+        .order_by(Submission.is_baseline.is_(True).desc(), TestResult.id)
+        .all()
+    )
 
     result_list = []
     for result in results:
@@ -28,6 +34,12 @@ def get_all_results(db: Session = Depends(get_db)):
                 ratio=result.ratio,
                 accuracy=result.accuracy,
                 status=result.status,
+                dataset=result.dataset,
+                encoding_throughput=result.encoding_throughput,
+                decoding_throughput=result.decoding_throughput,
+                bits_per_point=result.bits_per_point,
+                efficiency=result.efficiency,
+                baseline=bool(submission.is_baseline),
             )
         )
 
@@ -54,6 +66,14 @@ def get_result(id: str, db: Session = Depends(get_db)):
         peptide_percent_preserved=result.peptide_percent_preserved,
         peptide_percent_missed=result.peptide_percent_missed,
         peptide_percent_new=result.peptide_percent_new,
+        dataset=result.dataset,
+        encoding_throughput=result.encoding_throughput,
+        decoding_throughput=result.decoding_throughput,
+        bits_per_point=result.bits_per_point,
+        mz_bits_per_point=result.mz_bits_per_point,
+        intensity_bits_per_point=result.intensity_bits_per_point,
+        efficiency=result.efficiency,
+        baseline=bool(submission.is_baseline),
     )
 
 @router.get("/rank", response_model=RankModel)
@@ -62,9 +82,16 @@ def get_rank(id: str, db: Session = Depends(get_db)):
 
     if not result:
         raise HTTPException(status_code=404, detail="Result not found")
-    
+
+    # Reference codecs are shown on the leaderboard but never take a rank
+    ranked = (
+        db.query(func.count(TestResult.id))
+        .join(Submission)
+        .filter(Submission.is_baseline.isnot(True))
+    )
+
     encoding_runtime_rank = (
-        db.query(func.count())
+        ranked
         .filter(TestResult.encoding_runtime.isnot(None))
         .filter(TestResult.encoding_runtime < result.encoding_runtime)
         .scalar()
@@ -74,7 +101,7 @@ def get_rank(id: str, db: Session = Depends(get_db)):
     )
 
     decoding_runtime_rank = (
-        db.query(func.count())
+        ranked
         .filter(TestResult.decoding_runtime.isnot(None))
         .filter(TestResult.decoding_runtime < result.decoding_runtime)
         .scalar()
@@ -84,7 +111,7 @@ def get_rank(id: str, db: Session = Depends(get_db)):
     )
 
     ratio_rank = (
-        db.query(func.count())
+        ranked
         .filter(TestResult.ratio.isnot(None))
         .filter(TestResult.ratio > result.ratio)
         .scalar()
@@ -94,7 +121,7 @@ def get_rank(id: str, db: Session = Depends(get_db)):
     )
 
     accuracy_rank = (
-        db.query(func.count())
+        ranked
         .filter(TestResult.accuracy.isnot(None))
         .filter(TestResult.accuracy > result.accuracy)
         .scalar()
@@ -103,7 +130,7 @@ def get_rank(id: str, db: Session = Depends(get_db)):
         else None
     )
 
-    total_entries = db.query(func.count(TestResult.id)).scalar()
+    total_entries = ranked.scalar()
 
     return RankModel(
         submission_id=id,
@@ -116,21 +143,34 @@ def get_rank(id: str, db: Session = Depends(get_db)):
 
 
 @router.get("/submission-source")
-def get_submission_source(id: str):
-    try:
-        response = minio_client.get_object("submission-uploads", id)
-        zip_data = BytesIO(response.read())
-        with zipfile.ZipFile(zip_data, 'r') as zip_file:
-            encode_content = zip_file.read("transform/encode.py").decode('utf-8')
-            decode_content = zip_file.read("transform/decode.py").decode('utf-8')
-        
-        return {
-            "encode.py": encode_content,
-            "decode.py": decode_content
-        }
-    except minio_client.exceptions.NoSuchKey:
-        raise HTTPException(status_code=404, detail="File not found in MinIO bucket")
-    except KeyError:
-        raise HTTPException(status_code=400, detail="Required files are missing in the zip")
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"An unexpected error occurred: {str(e)}")
\ No newline at end of file
+def get_submission_source(id: str, request: Request, db: Session = Depends(get_db)):
+    submission = db.query(Submission).filter_by(file_key=id).first()
+    if not submission:
+        raise HTTPException(status_code=404, detail="Submission not found")
+
+    # Extracted at upload; submissions from before that are backfilled once
+    if submission.source_etag is None:
+        try:
+            backfill_artifacts(db, submission)
+        except S3Error as e:
+            if e.code != "NoSuchKey":
+                raise
+            raise HTTPException(status_code=404, detail="File not found in MinIO bucket")
+        except InvalidSubmission as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+    # A submission's source never changes, so clients may cache it forever
+    headers = {
+        "ETag": f'"{submission.source_etag}"',
+        "Cache-Control": "public, max-age=31536000, immutable",
+    }
+    if request.headers.get("if-none-match") == headers["ETag"]:
+        return Response(status_code=304, headers=headers)
+
+    return JSONResponse(
+        content={
+            "encode.py": submission.encode_source,
+            "decode.py": submission.decode_source,
+        },
+        headers=headers,
+    )
@@ -0,0 +1,46 @@
+from fastapi import APIRouter, Depends, Query
+from typing import List, Optional
+from datetime import datetime
+from sqlalchemy.orm import Session
+from models.models import BenchmarkRunModel
+from models.schema import BenchmarkRun, Submission
+from utils.database import get_db
+
+router = APIRouter()
+
+
+@router.get("/runs", response_model=List[BenchmarkRunModel])
+def get_runs(
+    submission_id: Optional[str] = None,
+    host: Optional[str] = None,
+    dataset_version: Optional[str] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    baseline: Optional[bool] = None,
+    flagged: Optional[bool] = None,
+    limit: int = Query(1000, ge=1, le=10000),
+    db: Session = Depends(get_db),
+):
+    # Run history as a time series, oldest first; limit keeps the newest runs
+    query = db.query(BenchmarkRun)
+    if submission_id is not None:
+        query = query.filter(BenchmarkRun.submission_id == submission_id)
+    if host is not None:
+        query = query.filter(BenchmarkRun.host == host)
+    if dataset_version is not None:
+        query = query.filter(BenchmarkRun.dataset_version == dataset_version)
+    if since is not None:
+        query = query.filter(BenchmarkRun.created_at >= since)
+    if until is not None:
+        query = query.filter(BenchmarkRun.created_at < until)
+    if baseline is not None:
+        query = query.join(Submission).filter(
+            Submission.is_baseline.is_(True)
+            if baseline
+            else Submission.is_baseline.isnot(True)
+        )
+    if flagged is not None:
+        query = query.filter(BenchmarkRun.drift_flagged.is_(flagged))
+
+    runs = query.order_by(BenchmarkRun.created_at.desc()).limit(limit).all()
+    return runs[::-1]
@@ -3,9 +3,19 @@ from sqlalchemy.orm import Session
 from utils.database import get_db
 from utils.minio import minio_client, BUCKET_NAME
 from models.schema import Submission
+from utils.artifacts import (
+    InvalidSubmission,
+    build_artifacts,
+    store_artifacts,
+    source_etag,
+)
+import os
 import uuid
 from io import BytesIO
 
+# Round new submissions are entered in, used to filter exports
+COMPETITION_ROUND = os.environ.get("COMPETITION_ROUND") or None
+
 router = APIRouter()
 
 @router.post("/upload")
@@ -22,6 +32,12 @@ async def upload(
     file_key = str(uuid.uuid4())
     zip_data = await file.read()
 
+    # Validate once and keep what the submission page and build need
+    try:
+        sources, tar_data, manifest = build_artifacts(zip_data)
+    except InvalidSubmission as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
     minio_client.put_object(
         BUCKET_NAME,
         file_key,
@@ -29,12 +45,17 @@ async def upload(
         length=len(zip_data),
         content_type="application/zip",
     )
+    store_artifacts(file_key, tar_data, manifest)
 
     new_submission = Submission(
         file_key=file_key,
         email=email,
         name=name,
         submission_name=submissionName,
+        encode_source=sources["encode.py"],
+        decode_source=sources["decode.py"],
+        source_etag=source_etag(sources),
+        round=COMPETITION_ROUND,
     )
     db.add(new_submission)
     db.commit()
@@ -0,0 +1,489 @@
+"""
+API load test and pipeline benchmark. Runs the FastAPI app in-process against
+local stand-ins (SQLite unless --database-url is given, a directory as object
+store, subprocesses as containers) while spectators poll the leaderboard and
+teams upload, build and get benchmarked.
+
+    python loadtest.py --spectators 50 --teams 5 --duration 60
+    python loadtest.py --compare loadtest-results/<commit>.json
+
+Reports latency percentiles and throughput per endpoint plus per-stage
+pipeline timings, and writes them as JSON keyed by the git commit. With
+--compare, exits non-zero when an endpoint got slower than --threshold.
+
+The pipeline workload encodes/decodes with the reference transform and
+reconstructs a synthetic mzML with the native engine. Search and compare
+need MSFragger and are not run.
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import shutil
+import subprocess
+import sys
+import time
+import zipfile
+from collections import defaultdict
+from datetime import datetime, timezone
+from io import BytesIO
+from tempfile import mkdtemp
+from bench import print_table
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+RESULTS_DIR = os.path.join(BACKEND_DIR, "loadtest-results")
+
+# Before a submission is benchmarked /result and /rank answer 404
+POLL_STATUSES = (200, 304, 404)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--spectators", type=int, default=20)
+    parser.add_argument("--teams", type=int, default=3)
+    parser.add_argument(
+        "--duration", type=float, default=30, help="Seconds spectators poll for"
+    )
+    parser.add_argument(
+        "--think-time", type=float, default=0.5, help="Mean seconds between polls"
+    )
+    parser.add_argument(
+        "--spectra", type=int, default=500, help="Spectra in the synthetic mzML"
+    )
+    parser.add_argument("--runs", type=int, default=1, help="Timed runs per mode")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--database-url", help="Defaults to SQLite in the workdir")
+    parser.add_argument(
+        "--workdir", help="Directory for objects, scratch and the SQLite database"
+    )
+    parser.add_argument(
+        "--keep", action="store_true", help="Keep the work directory afterwards"
+    )
+    parser.add_argument("--output", help="Defaults to loadtest-results/<commit>.json")
+    parser.add_argument("--compare", help="Earlier result JSON to compare against")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.2,
+        help="Relative p50/p90 increase reported as a regression",
+    )
+    parser.add_argument(
+        "--min-delta-ms",
+        type=float,
+        default=2.0,
+        help="Ignore latency changes smaller than this",
+    )
+    return parser.parse_args()
+
+
+def git_commit() -> str:
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=BACKEND_DIR,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+        dirty = subprocess.run(
+            ["git", "status", "--porcelain", "--untracked-files=no"],
+            cwd=BACKEND_DIR,
+            capture_output=True,
+            text=True,
+        ).stdout.strip()
+        return f"{commit}-dirty" if dirty else commit
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def write_synthetic_mzml(path: str, num_spectra: int, seed: int):
+    # Indexed mzML with a zlib m/z and a 32-bit intensity array per spectrum
+    import base64
+    import hashlib
+    import zlib
+    import numpy as np
+
+    rng = np.random.default_rng(seed)
+
+    def binary_array(values, dtype, accession, compressed):
+        data = values.astype(dtype).tobytes()
+        if compressed:
+            data = zlib.compress(data)
+        encoded = base64.b64encode(data)
+        compression = "MS:1000574" if compressed else "MS:1000576"
+        return (
+            b'<binaryDataArray encodedLength="%d">\n'
+            b'<cvParam cvRef="MS" accession="%s" name="precision"/>\n'
+            b'<cvParam cvRef="MS" accession="%s" name="compression"/>\n'
+            b"<binary>%s</binary>\n</binaryDataArray>\n"
+            % (len(encoded), accession.encode(), compression.encode(), encoded)
+        )
+
+    parts = [
+        b'<?xml version="1.0" encoding="utf-8"?>\n'
+        b'<indexedmzML xmlns="http://psi.hupo.org/ms/mzml">\n<mzML>\n<run>\n'
+        b'<spectrumList count="%d">\n' % num_spectra
+    ]
+    offsets = []
+    position = len(parts[0])
+    for index in range(num_spectra):
+        points = int(rng.integers(100, 400))
+        mz = np.sort(rng.uniform(100, 2000, points))
+        intensity = rng.gamma(2.0, 1e4, points)
+        spectrum = (
+            b'<spectrum index="%d" id="scan=%d" defaultArrayLength="%d">\n'
+            b'<binaryDataArrayList count="2">\n' % (index, index + 1, points)
+            + binary_array(mz, "<f8", "MS:1000523", True)
+            + binary_array(intensity, "<f4", "MS:1000521", False)
+            + b"</binaryDataArrayList>\n</spectrum>\n"
+        )
+        offsets.append(position)
+        position += len(spectrum)
+        parts.append(spectrum)
+    parts.append(b"</spectrumList>\n</run>\n</mzML>\n")
+    position += len(parts[-1])
+    index_list = (
+        b'<indexList count="1">\n<index name="spectrum">\n'
+        + b"".join(
+            b'<offset idRef="scan=%d">%d</offset>\n' % (index + 1, offset)
+            for index, offset in enumerate(offsets)
+        )
+        + b"</index>\n</indexList>\n"
+    )
+    parts.append(index_list)
+    parts.append(b"<indexListOffset>%d</indexListOffset>\n<fileChecksum>" % position)
+    document = b"".join(parts)
+    document += hashlib.sha1(document).hexdigest().encode()
+    document += b"</fileChecksum>\n</indexedmzML>\n"
+    with open(path, "wb") as f:
+        f.write(document)
+
+
+def team_zip(index: int) -> bytes:
+    # Every team submits the raw reference transform; it imports numpy and
+    # zstandard, which requirements.txt provides
+    baselines_dir = os.path.join(BACKEND_DIR, "baselines")
+    zip_data = BytesIO()
+    with zipfile.ZipFile(zip_data, "w", zipfile.ZIP_DEFLATED) as z:
+        for name in ["Dockerfile", "main.py"]:
+            z.write(os.path.join(baselines_dir, name), f"transform/{name}")
+        z.writestr("transform/encode.py", f"# Team {index} encoder\n")
+        z.writestr("transform/decode.py", f"# Team {index} decoder\n")
+    return zip_data.getvalue()
+
+
+class Recorder:
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+
+    async def request(self, client, name, method, url, ok=(200,), **kwargs):
+        start_time = time.perf_counter()
+        try:
+            response = await client.request(method, url, **kwargs)
+        except Exception as e:
+            self.errors[name] += 1
+            print(f"{name} failed: {e!r}", file=sys.stderr)
+            return None
+        self.latencies[name].append(time.perf_counter() - start_time)
+        if response.status_code not in ok:
+            self.errors[name] += 1
+        return response
+
+    def summary(self, wall_time: float) -> dict:
+        import numpy as np
+
+        endpoints = {}
+        for name, samples in sorted(self.latencies.items()):
+            ms = np.array(samples) * 1000
+            endpoints[name] = {
+                "count": len(samples),
+                "errors": self.errors[name],
+                "p50_ms": float(np.percentile(ms, 50)),
+                "p90_ms": float(np.percentile(ms, 90)),
+                "p99_ms": float(np.percentile(ms, 99)),
+                "max_ms": float(ms.max()),
+                "throughput_rps": len(samples) / wall_time,
+            }
+        return endpoints
+
+
+async def spectator(client, recorder, rng, deadline, think_time, team_keys, etags):
+    while time.perf_counter() < deadline:
+        await recorder.request(client, "GET /results", "GET", "/results")
+        if team_keys:
+            file_key = rng.choice(team_keys)
+            params = {"id": file_key}
+            await recorder.request(
+                client, "GET /result", "GET", "/result", POLL_STATUSES, params=params
+            )
+            await recorder.request(
+                client, "GET /rank", "GET", "/rank", POLL_STATUSES, params=params
+            )
+            headers = {"If-None-Match": etags[file_key]} if file_key in etags else {}
+            response = await recorder.request(
+                client,
+                "GET /submission-source",
+                "GET",
+                "/submission-source",
+                POLL_STATUSES,
+                params=params,
+                headers=headers,
+            )
+            if response is not None and response.status_code == 200:
+                etags[file_key] = response.headers.get("etag")
+        await recorder.request(
+            client, "GET /runs", "GET", "/runs", params={"limit": 100}
+        )
+        if think_time:
+            await asyncio.sleep(rng.expovariate(1 / think_time))
+
+
+async def team(client, recorder, index, team_keys, pipeline_queue):
+    response = await recorder.request(
+        client,
+        "POST /upload",
+        "POST",
+        "/upload",
+        data={
+            "email": f"team{index}@localhost",
+            "name": f"Team {index}",
+            "submissionName": f"loadtest-{index}",
+        },
+        files={"file": ("submission.zip", team_zip(index), "application/zip")},
+    )
+    if response is None or response.status_code != 200:
+        return
+    file_key = response.json()["file_key"]
+    team_keys.append(file_key)
+
+    response = await recorder.request(
+        client, "POST /build-container", "POST", f"/build-container/{file_key}"
+    )
+    if response is not None and "ERROR" not in response.text:
+        await pipeline_queue.put(file_key)
+
+
+def run_pipeline(file_key: str, num_runs: int):
+    from process import (
+        encode_benchmark,
+        reconstruct_submission,
+        update_database_entry,
+    )
+    from tempfile import TemporaryDirectory
+    from utils.database import session_scope
+    from utils.minio import RUN_BUCKET
+
+    with session_scope() as db_session, TemporaryDirectory() as work_dir:
+        update_database_entry(db_session, file_key, "status", "pending")
+        encode_benchmark(file_key, RUN_BUCKET, "test.npy", db_session, num_runs)
+        reconstruct_submission(file_key, work_dir)
+        update_database_entry(db_session, file_key, "status", "success")
+
+
+async def pipeline_worker(pipeline_queue, num_runs: int, completed: list):
+    # One timed worker: submissions are benchmarked one at a time
+    while True:
+        file_key = await pipeline_queue.get()
+        try:
+            await asyncio.to_thread(run_pipeline, file_key, num_runs)
+            completed.append(file_key)
+        except Exception as e:
+            print(f"Pipeline for {file_key} failed: {e!r}", file=sys.stderr)
+        finally:
+            pipeline_queue.task_done()
+
+
+async def run_load(args, app) -> tuple[dict, dict, float]:
+    import httpx
+    from utils.telemetry import record_stages
+
+    rng = random.Random(args.seed)
+    recorder = Recorder()
+    team_keys, etags, completed = [], {}, []
+    pipeline_queue = asyncio.Queue()
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(
+        transport=transport, base_url="http://loadtest", timeout=None
+    ) as client:
+        with record_stages() as timings:
+            start_time = time.perf_counter()
+            deadline = start_time + args.duration
+            worker = asyncio.create_task(
+                pipeline_worker(pipeline_queue, args.runs, completed)
+            )
+            await asyncio.gather(
+                *[
+                    team(client, recorder, index, team_keys, pipeline_queue)
+                    for index in range(args.teams)
+                ],
+                *[
+                    spectator(
+                        client,
+                        recorder,
+                        random.Random(rng.random()),
+                        deadline,
+                        args.think_time,
+                        team_keys,
+                        etags,
+                    )
+                    for _ in range(args.spectators)
+                ],
+            )
+            await pipeline_queue.join()
+            worker.cancel()
+            wall_time = time.perf_counter() - start_time
+
+    stages = defaultdict(list)
+    for name, duration in timings:
+        stages[name].append(duration)
+    pipeline = {
+        "submissions": len(completed),
+        "submissions_per_minute": len(completed) * 60 / wall_time,
+        "stages": {
+            name: {
+                "count": len(durations),
+                "mean_s": sum(durations) / len(durations),
+                "max_s": max(durations),
+            }
+            for name, durations in sorted(stages.items())
+        },
+    }
+    return recorder.summary(wall_time), pipeline, wall_time
+
+
+def compare(current: dict, baseline: dict, threshold: float, min_delta_ms: float):
+    """
+    Print per-endpoint latency changes. Returns the endpoints that regressed.
+    """
+    rows, regressions = [], []
+    for name, stats in current["endpoints"].items():
+        previous = baseline["endpoints"].get(name)
+        if previous is None:
+            continue
+        changes = []
+        for key in ("p50_ms", "p90_ms"):
+            delta = stats[key] - previous[key]
+            relative = delta / previous[key] if previous[key] else 0.0
+            changes.append(f"{key} {previous[key]:.1f} -> {stats[key]:.1f}")
+            if relative > threshold and delta > min_delta_ms:
+                regressions.append(name)
+        rows.append((name, *changes, "REGRESSION" if name in regressions else ""))
+    print_table(f"Compared with {baseline['commit']}", rows)
+    return sorted(set(regressions))
+
+
+def main():
+    args = parse_args()
+    workdir = os.path.abspath(args.workdir or mkdtemp(prefix="mecs-loadtest-"))
+    os.makedirs(workdir, exist_ok=True)
+
+    # Backends are selected before any backend module is imported
+    if args.database_url:
+        os.environ["DATABASE_URL"] = args.database_url
+    os.environ.setdefault("DATABASE_URL", f"sqlite:///{workdir}/loadtest.db?timeout=30")
+    os.environ.setdefault("SCRATCH_DIR", os.path.join(workdir, "scratch"))
+    os.environ.setdefault("MZML_ENGINE", "native")
+
+    from utils.backends import LocalObjectStore, SubprocessContainerRunner
+    from utils.minio import minio_client, initialize_buckets, BUCKETS, RUN_BUCKET
+    from utils.docker import docker_client
+
+    minio_client.override(LocalObjectStore(os.path.join(workdir, "objects")))
+    docker_client.override(
+        SubprocessContainerRunner(build_root=os.path.join(workdir, "images"))
+    )
+
+    # Request logs would drown the report
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+
+    from utils import mzml
+    from utils.database import init_db
+    from main import app
+
+    init_db()
+    initialize_buckets(BUCKETS)
+
+    # Benchmark input, as bootstrap.py would prepare it
+    dataset_dir = os.path.join(workdir, "dataset")
+    os.makedirs(dataset_dir, exist_ok=True)
+    mzml_path = os.path.join(dataset_dir, "test.mzML")
+    write_synthetic_mzml(mzml_path, args.spectra, args.seed)
+    mzml.deconstruct(
+        mzml_path,
+        os.path.join(dataset_dir, "test.xml"),
+        os.path.join(dataset_dir, "test.npy"),
+        workers=1,
+    )
+    for name in ["test.xml", "test.npy"]:
+        minio_client.fput_object(
+            RUN_BUCKET, f"init/deconstruct/{name}", os.path.join(dataset_dir, name)
+        )
+
+    endpoints, pipeline, wall_time = asyncio.run(run_load(args, app))
+
+    result = {
+        "commit": git_commit(),
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "config": {
+            key: getattr(args, key)
+            for key in ["spectators", "teams", "duration", "think_time", "spectra"]
+        }
+        | {"runs": args.runs, "database": os.environ["DATABASE_URL"].split(":")[0]},
+        "wall_time_s": wall_time,
+        "endpoints": endpoints,
+        "pipeline": pipeline,
+    }
+
+    print_table(
+        "Endpoints (count, errors, p50, p90, p99 ms, req/s)",
+        [
+            (
+                name,
+                stats["count"],
+                stats["errors"],
+                f"{stats['p50_ms']:.1f}",
+                f"{stats['p90_ms']:.1f}",
+                f"{stats['p99_ms']:.1f}",
+                f"{stats['throughput_rps']:.1f}",
+            )
+            for name, stats in endpoints.items()
+        ],
+    )
+    print_table(
+        "Pipeline stages (count, mean s, max s)",
+        [
+            (name, stats["count"], f"{stats['mean_s']:.3f}", f"{stats['max_s']:.3f}")
+            for name, stats in pipeline["stages"].items()
+        ]
+        + [("submissions/min", f"{pipeline['submissions_per_minute']:.2f}")],
+    )
+
+    output = args.output or os.path.join(RESULTS_DIR, f"{result['commit']}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(result, f, indent=2)
+    print(f"\nResults written to {output}")
+
+    regressions = []
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare(result, baseline, args.threshold, args.min_delta_ms)
+
+    if args.keep:
+        print(f"\nWork directory: {workdir}")
+    elif not args.workdir:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    if regressions:
+        print(f"\nRegressions: {', '.join(regressions)}")
+        return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,12 +1,8 @@
 from fastapi import FastAPI
-from models.schema import Base, engine
 from dotenv import load_dotenv
 from contextlib import asynccontextmanager
-from utils.minio import minio_client
-from utils.database import init_db
-from endpoints import upload, results, benchmark
-from tasks import prepare_benchmarks
-import os
+from endpoints import upload, results, benchmark, metrics, health, runs, export
+from utils.telemetry import init_tracing, instrument_celery
 import logging
 
 logging.basicConfig(level=logging.INFO)
@@ -17,19 +13,13 @@ load_dotenv()
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
+    # Tables, buckets and benchmark inputs are set up by bootstrap.py, so
+    # startup does not wait on the database, MinIO or Docker.
     logger.info("Starting up the application...")
     try:
-        # Database initialization
-        init_db()
-        logger.info("Database tables created successfully.")
-
-        # Download test file (if not exists)
-        mzml_file = os.environ.get("TEST_MZML")
-        mzml_file_url = os.environ.get("TEST_MZML_URL")
-        logger.info(f"mzml_file: {mzml_file}")
-        task = prepare_benchmarks.delay(url=mzml_file_url, object_name=mzml_file)
-        logger.info(f"Initialization task ID: {task.id}")
-
+        # Tracing, propagated into the Celery tasks this process enqueues
+        init_tracing("mecs-api")
+        instrument_celery()
     except Exception as e:
         logger.error(f"An error occurred during startup: {e}")
         raise
@@ -40,3 +30,7 @@ app = FastAPI(lifespan=lifespan, root_path="/api/")
 app.include_router(upload.router)
 app.include_router(results.router)
 app.include_router(benchmark.router)
+app.include_router(metrics.router)
+app.include_router(health.router)
+app.include_router(runs.router)
+app.include_router(export.router)
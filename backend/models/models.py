@@ -1,5 +1,6 @@
 from pydantic import BaseModel, EmailStr
 from typing import Optional
+from datetime import datetime
 
 
 class SubmissionModel(BaseModel):
@@ -34,12 +35,41 @@ class ResultModel(BaseModel):
     peptide_percent_preserved: Optional[float] = None
     peptide_percent_missed: Optional[float] = None
     peptide_percent_new: Optional[float] = None
+    dataset: Optional[str] = None
+    encoding_throughput: Optional[float] = None
+    decoding_throughput: Optional[float] = None
+    bits_per_point: Optional[float] = None
+    mz_bits_per_point: Optional[float] = None
+    intensity_bits_per_point: Optional[float] = None
+    efficiency: Optional[float] = None
+    baseline: bool = False
     status: str
 
     class Config:
         orm_mode = True
 
 
+class BenchmarkRunModel(BaseModel):
+    id: int
+    submission_id: str
+    created_at: datetime
+    host: Optional[str] = None
+    image_digest: Optional[str] = None
+    dataset: Optional[str] = None
+    dataset_version: Optional[str] = None
+    encoding_runtime: Optional[float] = None
+    decoding_runtime: Optional[float] = None
+    encoding_samples: Optional[list[float]] = None
+    decoding_samples: Optional[list[float]] = None
+    ratio: Optional[float] = None
+    resources: Optional[dict] = None
+    drift: Optional[float] = None
+    drift_flagged: bool = False
+
+    class Config:
+        orm_mode = True
+
+
 class RankModel(BaseModel):
     submission_id: str
     encoding_runtime_rank: Optional[int]
@@ -7,27 +7,54 @@ import requests
 from tempfile import NamedTemporaryFile, TemporaryDirectory
 import csv
 import os
+import hashlib
 from pathlib import Path
-import zipfile
 from shutil import copy2
+import numpy as np
 from minio import Minio
 from minio.error import S3Error
 from sqlalchemy.orm import Session
 from sqlalchemy.exc import SQLAlchemyError
 from models.schema import TestResult
 from utils.docker import (
+    docker_client,
     check_and_pull_image,
     check_and_pull_internal_image,
     delete_docker_image,
 )
 from utils.minio import minio_client, RUN_BUCKET
+from utils import mzml
+from utils.history import (
+    ContainerUsage,
+    usage_sampling_enabled,
+    record_benchmark_run,
+    image_digest,
+    resource_snapshot,
+)
+from utils.workers import has_capability
+from utils.scratch import stage_intermediate, fetch_intermediate, release_intermediate
+from utils.transfer import upload_directory, upload_zip_members
+from utils.telemetry import stage, record_minio_transfer, CONTAINER_START_SECONDS
+from utils.watchdog import (
+    ContainerTimeout,
+    ContainerOOM,
+    BenchmarkCancelled,
+    stage_budget,
+    create_host_config,
+    submission_labels,
+    is_cancelled,
+)
 
-docker_client = docker.APIClient()
+# "container" runs chrisagrams/mzml-construct, "native" the in-process
+# streaming engine in utils.mzml. The two write different .npy layouts, so
+# submissions must be benchmarked against a deconstruct from the same engine.
+MZML_ENGINE = os.environ.get("MZML_ENGINE", "container")
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 
+@stage("download")
 def download_file(url: str, bucket: str, prefix: str, object_name: str):
     try:
         # Ensure the bucket exists
@@ -59,6 +86,7 @@ def download_file(url: str, bucket: str, prefix: str, object_name: str):
                     length=len(response.content),
                     content_type=response.headers.get("content-type"),
                 )
+                record_minio_transfer("upload", len(response.content))
 
         logger.info(f"{object_name} successfully downloaded.")
     except S3Error as e:
@@ -67,20 +95,6 @@ def download_file(url: str, bucket: str, prefix: str, object_name: str):
         logger.error(f"HTTP request error: {e}")
 
 
-def put_directory_to_minio(bucket: str, prefix: str, output_dir: str):
-    for file_name in os.listdir(output_dir):
-        output_file_path = os.path.join(output_dir, file_name)
-        with open(output_file_path, "rb") as output_file:
-            file_stat = os.stat(output_file_path)
-            minio_client.put_object(
-                bucket,
-                f"{prefix}/{file_name}",
-                data=output_file,
-                length=file_stat.st_size,
-            )
-            logger.info(f"Created {prefix}/{file_name}.")
-
-
 def delete_from_minio(bucket: str, prefix: str, object_name: str):
     try:
         minio_client.stat_object(bucket, f"{prefix}/{object_name}")
@@ -91,18 +105,80 @@ def delete_from_minio(bucket: str, prefix: str, object_name: str):
         return False
 
 
-def deconstruct_file(bucket: str, prefix: str, object_name: str):
+def start_container(container_id: str, stage_name: str):
+    start_time = time.perf_counter()
+    docker_client.start(container=container_id)
+    CONTAINER_START_SECONDS.labels(stage=stage_name).observe(
+        time.perf_counter() - start_time
+    )
+
+
+def remove_container(container_id: str):
+    try:
+        docker_client.remove_container(container=container_id, force=True)
+    except docker.errors.NotFound:
+        pass
+
+
+def run_container(container_id: str, stage_name: str, submission_id: str = None):
+    """
+    Start a container and wait for it within the stage's wall-time budget.
+    Returns the seconds from start until it exited; the cancel and OOM
+    checks run after the clock stops. On timeout, memory exhaustion or
+    cancellation the container is killed and removed, and the matching
+    watchdog exception is raised.
+    """
+    timeout, mem_limit = stage_budget(stage_name)
+    start_time = time.perf_counter()
+    start_container(container_id, stage_name)
+    try:
+        docker_client.wait(container=container_id, timeout=timeout)
+        elapsed = time.perf_counter() - start_time
+    except (requests.exceptions.ReadTimeout, requests.exceptions.ConnectionError):
+        remove_container(container_id)
+        if is_cancelled(submission_id):
+            raise BenchmarkCancelled(submission_id)
+        raise ContainerTimeout(stage_name, timeout)
+
+    if is_cancelled(submission_id):
+        remove_container(container_id)
+        raise BenchmarkCancelled(submission_id)
+
+    state = docker_client.inspect_container(container_id)["State"]
+    if state.get("OOMKilled"):
+        remove_container(container_id)
+        raise ContainerOOM(stage_name, mem_limit)
+    return elapsed
+
+
+def _objects_exist(bucket: str, prefix: str, extensions: list[str]) -> bool:
+    objects = list(minio_client.list_objects(bucket, prefix=f"{prefix}/"))
+    return all(
+        any(obj.object_name.endswith(extension) for obj in objects)
+        for extension in extensions
+    )
+
+
+def deconstruct_exists(bucket: str, prefix: str) -> bool:
     # Check if deconstruct folder exists and if .xml and .npy files are present
-    objects = list(minio_client.list_objects(bucket, prefix=f"{prefix}/deconstruct/"))
-    xml_exists = any(obj.object_name.endswith(".xml") for obj in objects)
-    npy_exists = any(obj.object_name.endswith(".npy") for obj in objects)
-    if xml_exists and npy_exists:
+    return _objects_exist(bucket, f"{prefix}/deconstruct", [".xml", ".npy"])
+
+
+def search_exists(bucket: str, prefix: str) -> bool:
+    # Check if search folder exists and if search files are present
+    return _objects_exist(bucket, f"{prefix}/search", [".pepXML", ".pin", ".tsv"])
+
+
+@stage("deconstruct")
+def deconstruct_file(bucket: str, prefix: str, object_name: str):
+    if deconstruct_exists(bucket, prefix):
         logger.info("Deconstruct already exists. Skipping deconstruct.")
         return
 
     # Get mzML from bucket
     response = minio_client.get_object(bucket, f"{prefix}/{object_name}")
     file_data = response.read()
+    record_minio_transfer("download", len(file_data))
 
     # Create two temporary directories, input and output
     with TemporaryDirectory(dir="/tmp") as input_dir, TemporaryDirectory(
@@ -112,50 +188,57 @@ def deconstruct_file(bucket: str, prefix: str, object_name: str):
         with open(input_file_path, "wb") as input_file:
             input_file.write(file_data)
 
-        # Configure and start container
-        check_and_pull_image("chrisagrams/mzml-construct:latest")
-        container = docker_client.create_container(
-            image="chrisagrams/mzml-construct:latest",
-            command="python -u deconstruct.py /input/test.mzML /output/ -f npy",
-            host_config=docker_client.create_host_config(
-                binds={
-                    input_dir: {"bind": "/input", "mode": "ro"},
-                    output_dir: {"bind": "/output", "mode": "rw"},
-                }
-            ),
-        )
+        if MZML_ENGINE == "native":
+            stem = Path(object_name).stem
+            mzml.deconstruct(
+                input_file_path,
+                os.path.join(output_dir, f"{stem}.xml"),
+                os.path.join(output_dir, f"{stem}.npy"),
+            )
+        else:
+            # Configure and start container
+            check_and_pull_image("chrisagrams/mzml-construct:latest")
+            container = docker_client.create_container(
+                image="chrisagrams/mzml-construct:latest",
+                command="python -u deconstruct.py /input/test.mzML /output/ -f npy",
+                host_config=create_host_config(
+                    "deconstruct",
+                    binds={
+                        input_dir: {"bind": "/input", "mode": "ro"},
+                        output_dir: {"bind": "/output", "mode": "rw"},
+                    },
+                ),
+            )
 
-        container_id = container.get("Id")
+            container_id = container.get("Id")
 
-        docker_client.start(container=container_id)
-        docker_client.wait(container=container_id)
-        docker_client.remove_container(container=container_id)
+            run_container(container_id, "deconstruct")
+            docker_client.remove_container(container=container_id)
 
         # Upload results to MinIO
-        put_directory_to_minio(bucket, f"{prefix}/deconstruct", output_dir)
+        upload_directory(bucket, f"{prefix}/deconstruct", output_dir)
 
 
-def search_file(bucket: str, prefix: str, object_name: str):
-    # Check if search folder exists and if search files are present
-    objects = list(minio_client.list_objects(bucket, prefix=f"{prefix}/search/"))
-    pepxml_exists = any(obj.object_name.endswith(".pepXML") for obj in objects)
-    pin_exists = any(obj.object_name.endswith(".pin") for obj in objects)
-    tsv_exists = any(obj.object_name.endswith(".tsv") for obj in objects)
-    if pepxml_exists and pin_exists and tsv_exists:
+@stage("search")
+def search_file(
+    bucket: str, prefix: str, object_name: str, input_file_path: str = None
+):
+    if search_exists(bucket, prefix):
         logger.info("Search already exists. Skipping search.")
         return
 
-    # Get mzML from bucket
-    response = minio_client.get_object(bucket, f"{prefix}/{object_name}")
-    file_data = response.read()
-
     # Create two temporary directories, input and output
     with TemporaryDirectory(dir="/tmp") as input_dir, TemporaryDirectory(
         dir="/tmp"
     ) as output_dir:
-        input_file_path = os.path.join(input_dir, object_name)
-        with open(input_file_path, "wb") as input_file:
-            input_file.write(file_data)
+        if input_file_path is None:
+            # Get mzML from scratch (if staged on this worker) or bucket
+            input_file_path = os.path.join(input_dir, object_name)
+            fetch_intermediate(bucket, f"{prefix}/{object_name}", input_file_path)
+        else:
+            # Produced by an earlier stage of the same task, searched in place
+            input_dir = os.path.dirname(input_file_path)
+            object_name = os.path.basename(input_file_path)
 
         # Configure and start container
         check_and_pull_image("chrisagrams/msfragger:UP000005640")
@@ -163,7 +246,9 @@ def search_file(bucket: str, prefix: str, object_name: str):
             image="chrisagrams/msfragger:UP000005640",
             entrypoint="/app/entrypoint.sh",
             command=f"/input/{object_name} /output",
-            host_config=docker_client.create_host_config(
+            labels=submission_labels(prefix),
+            host_config=create_host_config(
+                "search",
                 binds={
                     input_dir: {"bind": "/input", "mode": "ro"},
                     output_dir: {"bind": "/output", "mode": "rw"},
@@ -173,20 +258,16 @@ def search_file(bucket: str, prefix: str, object_name: str):
 
         container_id = container.get("Id")
 
-        docker_client.start(container=container_id)
-        docker_client.wait(container=container_id)
+        run_container(container_id, "search", prefix)
         docker_client.remove_container(container=container_id)
 
-        # Unzip the output ZIP file
+        # Upload results to MinIO, streaming the output ZIP without extracting
         for file_name in os.listdir(output_dir):
             if file_name.endswith(".zip"):
                 zip_path = os.path.join(output_dir, file_name)
-                with zipfile.ZipFile(zip_path, "r") as zip_ref:
-                    zip_ref.extractall(output_dir)
+                upload_zip_members(bucket, f"{prefix}/search", zip_path)
                 os.remove(zip_path)
-
-        # Upload results to MinIO
-        put_directory_to_minio(bucket, f"{prefix}/search", output_dir)
+        upload_directory(bucket, f"{prefix}/search", output_dir)
 
 
 def update_database_entry(db_session, submission_id, field, value):
@@ -194,6 +275,15 @@ def update_database_entry(db_session, submission_id, field, value):
     Utility function to update a specific field in the database.
     If the entry does not exist, it creates a new one.
     """
+    update_database_entries(db_session, submission_id, {field: value})
+
+
+@stage("db_write")
+def update_database_entries(db_session, submission_id, values: dict):
+    """
+    Update several fields of the submission's TestResult in one commit.
+    """
+    fields = ", ".join(values)
     try:
         test_result = (
             db_session.query(TestResult).filter_by(submission_id=submission_id).first()
@@ -208,41 +298,52 @@ def update_database_entry(db_session, submission_id, field, value):
                 status="pending",
             )
             db_session.add(test_result)
-        setattr(test_result, field, value)
+        for field, value in values.items():
+            setattr(test_result, field, value)
         db_session.commit()
-        logger.info(f"Updated {field} for ID: {submission_id} with value: {value}")
+        logger.info(f"Updated {fields} for ID: {submission_id} with values: {values}")
     except SQLAlchemyError as e:
         db_session.rollback()
-        logger.error(f"Failed to update {field} for ID {submission_id}: {str(e)}")
+        logger.error(f"Failed to update {fields} for ID {submission_id}: {str(e)}")
 
 
 def eval_container(
-    image: str, command: str, host_config: HostConfig, num_runs=5
-) -> float:
-    run_times = []
-    for _ in range(num_runs):
-        # Create container
-        container = docker_client.create_container(
-            image=image, command=command, host_config=host_config
-        )
-
-        container_id = container.get("Id")
-
-        # Start timing
-        start_time = time.time()
+    image: str,
+    command: str,
+    host_config: HostConfig,
+    num_runs=5,
+    stage_name="encode",
+    submission_id: str = None,
+) -> tuple[list[float], list[dict]]:
+    run_times, usages = [], []
+    for run in range(num_runs):
+        with stage(f"{stage_name}_run", image=image, run=run):
+            # Create container
+            container = docker_client.create_container(
+                image=image,
+                command=command,
+                host_config=host_config,
+                labels=submission_labels(submission_id),
+            )
 
-        docker_client.start(container=container_id)
-        docker_client.wait(container=container_id)
+            container_id = container.get("Id")
 
-        end_time = time.time()
-        run_times.append(end_time - start_time)
+            # Timed from start until exit, without the watchdog checks
+            if usage_sampling_enabled():
+                with ContainerUsage(container_id) as usage:
+                    run_times.append(
+                        run_container(container_id, stage_name, submission_id)
+                    )
+                usages.append(usage.summary())
+            else:
+                run_times.append(run_container(container_id, stage_name, submission_id))
 
-        # Remove container after run
-        docker_client.remove_container(container=container_id, force=True)
+            # Remove container after run
+            docker_client.remove_container(container=container_id, force=True)
 
-    # Calculate average execution time
-    average_time = mean(run_times)
-    return average_time
+    # Every sample, and its container usage when sampled, is kept in the run
+    # history; callers average the samples
+    return run_times, usages
 
 
 def compute_ratio(original_file: Path, compressed_file: Path) -> float:
@@ -256,12 +357,102 @@ def compute_ratio(original_file: Path, compressed_file: Path) -> float:
     return compression_ratio
 
 
+def split_channels(array: np.ndarray):
+    """
+    Return the (m/z, intensity) parts of a deconstructed array, or None when
+    the layout does not separate them (e.g. a flat or opaque byte array).
+    """
+    if array.dtype.names and len(array.dtype.names) == 2:
+        names = array.dtype.names
+        mz_field = next((n for n in names if "mz" in n.lower()), names[0])
+        intensity_field = next(n for n in names if n != mz_field)
+        return array[mz_field], array[intensity_field]
+    if array.ndim == 2 and array.shape[0] == 2:
+        return array[0], array[1]
+    if array.ndim == 2 and array.shape[1] == 2:
+        return array[:, 0], array[:, 1]
+    return None
+
+
+def load_npy(path: Path):
+    try:
+        return np.load(path, mmap_mode="r", allow_pickle=False)
+    except (OSError, ValueError) as e:
+        logger.info(f"{path} is not a plain .npy array: {e}")
+        return None
+
+
+def compute_throughput_metrics(
+    original_file: Path,
+    compressed_file: Path,
+    encoding_runtime: float,
+    decoding_runtime: float,
+) -> dict:
+    """
+    Size-normalized metrics so results compare across datasets:
+    encode/decode throughput in MB/s of raw spectral data, bits per data
+    point (overall and per channel where the encoded output keeps m/z and
+    intensity apart) and an efficiency score: round-trip throughput scaled
+    by the compression factor.
+    """
+    metrics = {
+        "encoding_throughput": None,
+        "decoding_throughput": None,
+        "bits_per_point": None,
+        "mz_bits_per_point": None,
+        "intensity_bits_per_point": None,
+        "efficiency": None,
+    }
+    original = load_npy(original_file)
+    if original is None:
+        return metrics
+
+    # Every spectrum carries as many intensities as m/z values
+    channels = split_channels(original)
+    if channels is not None:
+        mz_points, intensity_points = channels[0].size, channels[1].size
+    else:
+        mz_points = intensity_points = original.size // 2
+    total_points = mz_points + intensity_points
+
+    raw_mb = original.nbytes / 1e6
+    compressed_size = os.path.getsize(compressed_file)
+    if encoding_runtime:
+        metrics["encoding_throughput"] = raw_mb / encoding_runtime
+    if decoding_runtime:
+        metrics["decoding_throughput"] = raw_mb / decoding_runtime
+    if total_points:
+        metrics["bits_per_point"] = compressed_size * 8 / total_points
+    if compressed_size and encoding_runtime and decoding_runtime:
+        metrics["efficiency"] = (
+            (original.nbytes / compressed_size)
+            * raw_mb
+            / (encoding_runtime + decoding_runtime)
+        )
+
+    compressed = load_npy(compressed_file)
+    compressed_channels = (
+        split_channels(compressed) if compressed is not None else None
+    )
+    if compressed_channels is not None and mz_points and intensity_points:
+        metrics["mz_bits_per_point"] = compressed_channels[0].nbytes * 8 / mz_points
+        metrics["intensity_bits_per_point"] = (
+            compressed_channels[1].nbytes * 8 / intensity_points
+        )
+
+    return metrics
+
+
+@stage("encode_benchmark")
 def encode_benchmark(
-    image: str, src_bucket: str, object_name: str, db_session: Session
+    image: str, src_bucket: str, object_name: str, db_session: Session, num_runs=5
 ):
     # Get npy from bucket
     response = minio_client.get_object(src_bucket, f"init/deconstruct/{object_name}")
     file_data = response.read()
+    record_minio_transfer("download", len(file_data))
+    dataset_version = hashlib.sha256(file_data).hexdigest()
+    resources_start = resource_snapshot()
 
     # Create two temporary directories, input and output
     with TemporaryDirectory(dir="/tmp") as input_dir, TemporaryDirectory(
@@ -273,18 +464,24 @@ def encode_benchmark(
 
         # Evaluate encode
         check_and_pull_internal_image(image_name=f"transform-{image}")
-        encoding_runtime = eval_container(
+        digest = image_digest(f"transform-{image}")
+        encoding_samples, encoding_usage = eval_container(
             image=f"transform-{image}",
             command="python -u main.py /input/test.npy /output/transformed.npy --mode=encode",
-            host_config=docker_client.create_host_config(
+            host_config=create_host_config(
+                "encode",
                 binds={
                     input_dir: {"bind": "/input", "mode": "ro"},
                     output_dir: {"bind": "/output", "mode": "rw"},
                 }
             ),
+            num_runs=num_runs,
+            stage_name="encode",
+            submission_id=image,
         )
 
         # Update in DB
+        encoding_runtime = mean(encoding_samples)
         update_database_entry(db_session, image, "encoding_runtime", encoding_runtime)
 
         # Copy transformed.npy to input_dir
@@ -298,18 +495,23 @@ def encode_benchmark(
 
         # Decoding runtime
         check_and_pull_internal_image(image_name=f"transform-{image}")
-        decoding_runtime = eval_container(
+        decoding_samples, decoding_usage = eval_container(
             image=f"transform-{image}",
             command="python -u main.py /input/transformed.npy /output/new.npy --mode=decode",
-            host_config=docker_client.create_host_config(
+            host_config=create_host_config(
+                "decode",
                 binds={
                     input_dir: {"bind": "/input", "mode": "ro"},
                     output_dir: {"bind": "/output", "mode": "rw"},
                 }
             ),
+            num_runs=num_runs,
+            stage_name="decode",
+            submission_id=image,
         )
 
         # Update in DB
+        decoding_runtime = mean(decoding_samples)
         update_database_entry(db_session, image, "decoding_runtime", decoding_runtime)
 
         # Compute compression ratio
@@ -320,73 +522,91 @@ def encode_benchmark(
         # Update compression ratio in the database
         update_database_entry(db_session, image, "ratio", compression_ratio)
 
-        # Put resulting .npy to submission run bucket
+        # Size-normalized metrics for the dataset this run was measured on
+        throughput_metrics = compute_throughput_metrics(
+            original_file, compressed_file, encoding_runtime, decoding_runtime
+        )
+        throughput_metrics["dataset"] = os.environ.get("TEST_MZML")
+        update_database_entries(db_session, image, throughput_metrics)
+
+        # Append to the run history (and check references for drift)
+        record_benchmark_run(
+            db_session,
+            image,
+            resources={
+                "start": resources_start,
+                "end": resource_snapshot(),
+                "encode": encoding_usage,
+                "decode": decoding_usage,
+            },
+            image_digest=digest,
+            dataset=throughput_metrics["dataset"],
+            dataset_version=dataset_version,
+            encoding_runtime=encoding_runtime,
+            decoding_runtime=decoding_runtime,
+            encoding_samples=encoding_samples,
+            decoding_samples=decoding_samples,
+            ratio=compression_ratio,
+        )
+
+        # Hand resulting .npy to the reconstruct stage, which only runs on
+        # this node if it can also search
         new_npy = os.path.join(output_dir, "new.npy")
-        with open(new_npy, "rb") as output_file:
-            file_stat = os.stat(new_npy)
-            minio_client.put_object(
-                RUN_BUCKET,
-                f"{image}/new.npy",
-                data=output_file,
-                length=file_stat.st_size,
-            )
+        stage_intermediate(
+            RUN_BUCKET, f"{image}/new.npy", new_npy, local=has_capability("search")
+        )
 
         # Delete image from local registry
         delete_docker_image(image_name=f"transform-{image}")
 
 
-def reconstruct_submission(image: str):
-    # Get npy from bucket
-    response = minio_client.get_object(RUN_BUCKET, f"{image}/new.npy")
-    npy_data = response.read()
-
+@stage("reconstruct")
+def reconstruct_submission(image: str, output_dir: str) -> str:
+    """
+    Rebuild the submission's mzML from its decoded new.npy into output_dir.
+    Returns the path of new.mzML, searched in place by the same task.
+    """
     # Get XML from bucket
     response = minio_client.get_object(RUN_BUCKET, f"init/deconstruct/test.xml")
     xml_data = response.read()
+    record_minio_transfer("download", len(xml_data))
 
-    # Create two temporary directories, input and output
-    with TemporaryDirectory(dir="/tmp") as input_dir, TemporaryDirectory(
-        dir="/tmp"
-    ) as output_dir:
+    with TemporaryDirectory(dir="/tmp") as input_dir:
+        # Get npy from scratch (if encoded on this worker) or bucket
         npy_file_path = os.path.join(input_dir, "new.npy")
-        with open(npy_file_path, "wb") as input_file:
-            input_file.write(npy_data)
+        fetch_intermediate(RUN_BUCKET, f"{image}/new.npy", npy_file_path)
         xml_file_path = os.path.join(input_dir, "test.xml")
         with open(xml_file_path, "wb") as input_file:
             input_file.write(xml_data)
 
         # Reconstruct mzML
-        check_and_pull_image("chrisagrams/mzml-construct:latest")
-        container = docker_client.create_container(
-            image="chrisagrams/mzml-construct:latest",
-            command="python -u construct.py /input/test.xml /input/new.npy /output/new.mzML",
-            host_config=docker_client.create_host_config(
-                binds={
-                    input_dir: {"bind": "/input", "mode": "ro"},
-                    output_dir: {"bind": "/output", "mode": "rw"},
-                }
-            ),
-        )
+        new_mzml_path = os.path.join(output_dir, "new.mzML")
+        if MZML_ENGINE == "native":
+            mzml.construct(xml_file_path, npy_file_path, new_mzml_path)
+        else:
+            check_and_pull_image("chrisagrams/mzml-construct:latest")
+            container = docker_client.create_container(
+                image="chrisagrams/mzml-construct:latest",
+                command="python -u construct.py /input/test.xml /input/new.npy /output/new.mzML",
+                labels=submission_labels(image),
+                host_config=create_host_config(
+                    "reconstruct",
+                    binds={
+                        input_dir: {"bind": "/input", "mode": "ro"},
+                        output_dir: {"bind": "/output", "mode": "rw"},
+                    },
+                ),
+            )
 
-        container_id = container.get("Id")
+            container_id = container.get("Id")
 
-        docker_client.start(container=container_id)
-        docker_client.wait(container=container_id)
-        docker_client.remove_container(container=container_id)
+            run_container(container_id, "reconstruct", image)
+            docker_client.remove_container(container=container_id)
 
-        # Copy new.mzML to MinIO
-        new_mzml_path = os.path.join(output_dir, "new.mzML")
-        with open(new_mzml_path, "rb") as output_file:
-            file_stat = os.stat(new_mzml_path)
-            minio_client.put_object(
-                RUN_BUCKET,
-                f"{image}/new.mzML",
-                data=output_file,
-                length=file_stat.st_size,
-            )
+        # Delete new.npy from scratch / MinIO
+        release_intermediate(RUN_BUCKET, f"{image}/new.npy")
 
-        # Delete new.npy from MinIO
-        minio_client.remove_object(RUN_BUCKET, f"{image}/new.npy")
+    return new_mzml_path
 
 
 def extract_result_metrics(output_dir):
@@ -402,14 +622,17 @@ def extract_result_metrics(output_dir):
     return metrics
 
 
+@stage("compare")
 def compare_results(image: str, db_session: Session):
     # Get original pin file
     response = minio_client.get_object(RUN_BUCKET, f"init/search/test.pin")
     original_pin_data = response.read()
+    record_minio_transfer("download", len(original_pin_data))
 
     # Get search pin file
     response = minio_client.get_object(RUN_BUCKET, f"{image}/search/new.pin")
     new_pin_data = response.read()
+    record_minio_transfer("download", len(new_pin_data))
 
     with TemporaryDirectory(dir="/tmp") as input_dir, TemporaryDirectory(
         dir="/tmp"
@@ -427,7 +650,9 @@ def compare_results(image: str, db_session: Session):
         container = docker_client.create_container(
             image="chrisagrams/pats-compare:latest",
             command="/input/test.pin /input/new.pin /output/",
-            host_config=docker_client.create_host_config(
+            labels=submission_labels(image),
+            host_config=create_host_config(
+                "compare",
                 binds={
                     input_dir: {"bind": "/input", "mode": "ro"},
                     output_dir: {"bind": "/output", "mode": "rw"},
@@ -437,11 +662,10 @@ def compare_results(image: str, db_session: Session):
 
         container_id = container.get("Id")
 
-        docker_client.start(container=container_id)
-        docker_client.wait(container=container_id)
+        run_container(container_id, "compare", image)
 
         logs = docker_client.logs(container=container_id)
-        logger.info(f"pats-compare: {logs.decode("utf-8")}") 
+        logger.info(f"pats-compare: {logs.decode('utf-8')}")
         
         docker_client.remove_container(container=container_id)
 
@@ -1,8 +1,46 @@
-from celery import Celery, chain
+import os
+from contextlib import contextmanager
+from tempfile import TemporaryDirectory
+from celery import Celery
+from celery.exceptions import SoftTimeLimitExceeded
+from celery.signals import (
+    celeryd_after_setup,
+    worker_init,
+    worker_process_init,
+    worker_process_shutdown,
+)
+from celery.utils import worker_direct
+from prometheus_client import multiprocess
 from kombu import Queue, Exchange
+from dotenv import load_dotenv
 from process import *
 from utils.minio import RUN_BUCKET
-from utils.database import get_db
+from utils.database import session_scope, reset_engine_after_fork
+from utils.scratch import scratch_enabled, release_intermediate, clear_scratch
+from utils.workers import has_capability, derive_capabilities
+from utils.telemetry import (
+    init_tracing,
+    instrument_celery,
+    serve_metrics,
+    PROMETHEUS_MULTIPROC_DIR,
+)
+from utils.watchdog import (
+    ContainerTimeout,
+    ContainerOOM,
+    BenchmarkCancelled,
+    stage_budget,
+    is_cancelled,
+    kill_submission_containers,
+)
+from utils.baselines import (
+    BASELINE_CODECS,
+    baseline_key,
+    register_baseline,
+    baseline_benchmarked,
+    build_baseline_image,
+)
+
+load_dotenv()
 
 celery_app = Celery("tasks", broker="redis://redis", backend="redis://redis")
 
@@ -12,42 +50,207 @@ submission_exchange = Exchange("submission", type="direct")
 celery_app.conf.task_queues = (
     Queue("default", default_exchange, routing_key="default"),
     Queue("timed", submission_exchange, routing_key="submission.timed"),
+    Queue("search", submission_exchange, routing_key="submission.search"),
 )
 
+# Benchmarks run for minutes to hours: take one task at a time and only ack
+# it once finished, so a lost worker's task goes back to the queue.
+celery_app.conf.task_acks_late = True
+celery_app.conf.worker_prefetch_multiplier = 1
 
-@celery_app.task(queue="default")
+# Used by workers started with --autoscale=max,min
+celery_app.conf.worker_autoscaler = "utils.workers:QueueCostAutoscaler"
+
+# Every worker also consumes a queue of its own, so stages that share files
+# through the worker-local scratch store can be pinned to the same node.
+celery_app.conf.worker_direct = True
+
+# Reference codecs are re-timed periodically (celery beat) so drifting or
+# degraded benchmark nodes show up in the run history.
+REFERENCE_RERUN_INTERVAL = float(os.environ.get("REFERENCE_RERUN_INTERVAL", 86400))
+celery_app.conf.beat_schedule = {
+    "rerun-reference-timings": {
+        "task": "tasks.rerun_reference_timings",
+        "schedule": REFERENCE_RERUN_INTERVAL,
+    },
+}
+
+
+@celeryd_after_setup.connect(weak=False)
+def tag_worker(sender, instance, **kwargs):
+    # Runs after -Q was applied and before the pool forks
+    derive_capabilities(instance.app)
+
+
+# Port this worker serves its metrics on, for Prometheus to scrape
+WORKER_METRICS_PORT = os.environ.get("WORKER_METRICS_PORT")
+
+
+@worker_init.connect(weak=False)
+def start_worker_metrics(*args, **kwargs):
+    if WORKER_METRICS_PORT:
+        serve_metrics(int(WORKER_METRICS_PORT))
+
+
+@worker_process_init.connect(weak=False)
+def init_worker_process(*args, **kwargs):
+    reset_engine_after_fork()
+    init_tracing("mecs-worker")
+    instrument_celery()
+
+
+@worker_process_shutdown.connect(weak=False)
+def cleanup_worker_metrics(pid=None, *args, **kwargs):
+    if PROMETHEUS_MULTIPROC_DIR:
+        multiprocess.mark_process_dead(pid)
+
+
+# Backstop for time spent outside containers, on top of the per-stage budgets
+TASK_SLACK = 600
+ENCODE_TIME_LIMIT = (
+    5 * (stage_budget("encode")[0] + stage_budget("decode")[0]) + TASK_SLACK
+)
+POST_ENCODE_TIME_LIMIT = (
+    stage_budget("reconstruct")[0]
+    + stage_budget("search")[0]
+    + stage_budget("compare")[0]
+    + TASK_SLACK
+)
+
+# Unacked tasks are redelivered after the visibility timeout, which must
+# outlast the longest task or it would run twice.
+celery_app.conf.broker_transport_options = {
+    "visibility_timeout": max(ENCODE_TIME_LIMIT, POST_ENCODE_TIME_LIMIT)
+    + 2 * TASK_SLACK
+}
+
+
+@contextmanager
+def supervised(db_session, image: str):
+    """
+    Record watchdog outcomes (timeout, oom, cancelled) on the submission and
+    end the task cleanly so the worker is freed for the next benchmark.
+    """
+    try:
+        yield
+    except (ContainerTimeout, ContainerOOM, BenchmarkCancelled) as e:
+        logger.warning(f"Benchmark for {image} stopped: {e.status} {e}")
+        if e.status != "cancelled":
+            update_database_entry(db_session, image, "status", e.status)
+    except SoftTimeLimitExceeded:
+        logger.warning(f"Benchmark for {image} exceeded its task time limit.")
+        kill_submission_containers(image)
+        update_database_entry(db_session, image, "status", "timeout")
+
+
+def handoff_options(hostname: str) -> dict:
+    # Stay on this node only if it can run the search stages itself
+    if scratch_enabled() and has_capability("search"):
+        return {"queue": worker_direct(hostname)}
+    return {}
+
+
+@celery_app.task(queue="search")
 def prepare_benchmarks(url: str, object_name: str):
     download_file(url, RUN_BUCKET, "init", object_name)
     deconstruct_file(RUN_BUCKET, "init", object_name)
     search_file(RUN_BUCKET, "init", object_name)
 
 
-@celery_app.task(queue="timed")
-def encode_benchmark_task(image: str, bucket: str, filename: str):
-    db_session = next(get_db())
-    encode_benchmark(image, bucket, filename, db_session)
-    return image  # On success, return image name for next task
+@celery_app.task(
+    queue="timed",
+    bind=True,
+    soft_time_limit=ENCODE_TIME_LIMIT,
+    time_limit=ENCODE_TIME_LIMIT + 60,
+)
+def encode_benchmark_task(self, image: str, bucket: str, filename: str):
+    if is_cancelled(image):
+        return image
+    handed_off = False
+    try:
+        with session_scope() as db_session, supervised(db_session, image):
+            encode_benchmark(image, bucket, filename, db_session)
+            # Continue on this node when new.npy was left in local scratch
+            post_encode_benchmark.apply_async(
+                args=[image], **handoff_options(self.request.hostname)
+            )
+            handed_off = True
+    finally:
+        if not handed_off:
+            clear_scratch(RUN_BUCKET, image)
+    return image
 
 
-@celery_app.task(queue="default")
+@celery_app.task(
+    queue="search",
+    soft_time_limit=POST_ENCODE_TIME_LIMIT,
+    time_limit=POST_ENCODE_TIME_LIMIT + 60,
+)
 def post_encode_benchmark(image: str):
-    db_session = next(get_db())
-    reconstruct_submission(image)
-    search_file(RUN_BUCKET, image, "new.mzML")
-    delete_from_minio(RUN_BUCKET, image, "new.mzML")
-    compare_results(image, db_session)
-    update_database_entry(db_session, image, "status", "success")
+    if is_cancelled(image):
+        return image
+    try:
+        with session_scope() as db_session, supervised(
+            db_session, image
+        ), TemporaryDirectory(dir="/tmp") as work_dir:
+            # new.mzML stays in this task: no scratch or MinIO round trip
+            mzml_path = reconstruct_submission(image, work_dir)
+            search_file(RUN_BUCKET, image, "new.mzML", mzml_path)
+            os.remove(mzml_path)
+            compare_results(image, db_session)
+            if not is_cancelled(image):
+                update_database_entry(db_session, image, "status", "success")
+    finally:
+        # Intermediates left behind by a failed or stopped run would
+        # otherwise pile up in the (tmpfs) scratch store
+        clear_scratch(RUN_BUCKET, image)
     return image
 
 
 @celery_app.task(queue="default")
 def benchmark_image(image: str):
-    db_session = next(get_db())
-    update_database_entry(db_session, image, "status", "pending")
+    with session_scope() as db_session:
+        update_database_entry(db_session, image, "status", "pending")
+
+    encode_benchmark_task.apply_async(args=[image, RUN_BUCKET, "test.npy"])
+
+
+@celery_app.task(queue="default")
+def prepare_baselines():
+    for codec in BASELINE_CODECS:
+        with session_scope() as db_session:
+            file_key = register_baseline(db_session, codec).file_key
+            if baseline_benchmarked(db_session, codec):
+                logger.info(f"Baseline {codec} already benchmarked. Skipping.")
+                continue
+        # Image builds can take minutes; don't hold a connection meanwhile
+        if build_baseline_image(codec):
+            benchmark_image(file_key)
 
-    task_chain = chain(
-        encode_benchmark_task.s(image, RUN_BUCKET, "test.npy"),
-        post_encode_benchmark.s(),
-    )
 
-    task_chain.apply_async()
+@celery_app.task(
+    queue="timed",
+    soft_time_limit=ENCODE_TIME_LIMIT,
+    time_limit=ENCODE_TIME_LIMIT + 60,
+)
+def time_reference(image: str, bucket: str, filename: str):
+    # Timing only; accuracy of a reference codec does not change between runs
+    try:
+        with session_scope() as db_session, supervised(db_session, image):
+            encode_benchmark(image, bucket, filename, db_session)
+        release_intermediate(RUN_BUCKET, f"{image}/new.npy")
+    finally:
+        clear_scratch(RUN_BUCKET, image)
+    return image
+
+
+@celery_app.task(queue="default")
+def rerun_reference_timings():
+    with session_scope() as db_session:
+        file_keys = [
+            baseline_key(codec)
+            for codec in BASELINE_CODECS
+            if baseline_benchmarked(db_session, codec)
+        ]
+    for file_key in file_keys:
+        time_reference.apply_async(args=[file_key, RUN_BUCKET, "test.npy"])
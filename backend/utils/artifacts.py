@@ -0,0 +1,160 @@
+import json
+import hashlib
+import logging
+import tarfile
+from io import BytesIO
+from zipfile import ZipFile, BadZipFile
+from minio.error import S3Error
+from sqlalchemy.orm import Session
+from models.schema import Submission
+from utils.minio import minio_client, BUCKET_NAME
+from utils.telemetry import record_minio_transfer
+
+# Files shown on the submission page, relative to transform/
+SOURCE_FILES = ["encode.py", "decode.py"]
+
+logger = logging.getLogger(__name__)
+
+
+class InvalidSubmission(Exception):
+    pass
+
+
+def artifact_key(file_key: str, name: str) -> str:
+    return f"artifacts/{file_key}/{name}"
+
+
+def _sha256(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def _transform_members(z: ZipFile):
+    for file_info in z.infolist():
+        if file_info.is_dir() or not file_info.filename.startswith("transform/"):
+            continue
+        relative_path = file_info.filename[len("transform/") :]
+        # Skip the __pycache__ folder and its contents
+        if relative_path.split("/")[0] == "__pycache__":
+            continue
+        yield relative_path, file_info
+
+
+def create_transform_tar(zip_data: BytesIO) -> BytesIO:
+    tar_data = BytesIO()
+    with ZipFile(zip_data) as z:
+        if not any(info.filename.startswith("transform/") for info in z.infolist()):
+            # Check if transform directory is present
+            return None
+
+        # Create a tar archive for the "transform" directory
+        with tarfile.open(fileobj=tar_data, mode="w") as tar:
+            for relative_path, file_info in _transform_members(z):
+                file_bytes = z.read(file_info)
+                tar_info = tarfile.TarInfo(name=relative_path)
+                tar_info.size = len(file_bytes)
+                tar.addfile(tar_info, BytesIO(file_bytes))
+        tar_data.seek(0)
+        return tar_data
+
+
+def build_artifacts(zip_data: bytes) -> tuple[dict, bytes, dict]:
+    """
+    Validate an uploaded submission zip and derive everything later requests
+    need from it: the source preview, the Docker build context and a manifest.
+    Raises InvalidSubmission if the zip cannot be benchmarked.
+    """
+    try:
+        with ZipFile(BytesIO(zip_data)) as z:
+            members = list(_transform_members(z))
+            names = {relative_path for relative_path, _ in members}
+            missing = [
+                name for name in ["Dockerfile", *SOURCE_FILES] if name not in names
+            ]
+            if missing:
+                raise InvalidSubmission(
+                    f"Missing transform/{', transform/'.join(missing)} in zip."
+                )
+
+            sources = {}
+            files = []
+            for relative_path, file_info in members:
+                file_bytes = z.read(file_info)
+                files.append(
+                    {
+                        "path": relative_path,
+                        "size": len(file_bytes),
+                        "sha256": _sha256(file_bytes),
+                    }
+                )
+                if relative_path in SOURCE_FILES:
+                    sources[relative_path] = file_bytes.decode("utf-8")
+    except BadZipFile:
+        raise InvalidSubmission("File is not a valid zip archive.")
+    except UnicodeDecodeError:
+        raise InvalidSubmission("Source files must be UTF-8 encoded.")
+
+    tar_data = create_transform_tar(BytesIO(zip_data)).getvalue()
+    manifest = {
+        "zip": {"size": len(zip_data), "sha256": _sha256(zip_data)},
+        "context": {"size": len(tar_data), "sha256": _sha256(tar_data)},
+        "files": files,
+    }
+    return sources, tar_data, manifest
+
+
+def source_etag(sources: dict) -> str:
+    return _sha256(json.dumps(sources, sort_keys=True).encode())
+
+
+def store_artifacts(file_key: str, tar_data: bytes, manifest: dict):
+    manifest_data = json.dumps(manifest, indent=2).encode()
+    for name, data, content_type in [
+        ("context.tar", tar_data, "application/x-tar"),
+        ("manifest.json", manifest_data, "application/json"),
+    ]:
+        minio_client.put_object(
+            BUCKET_NAME,
+            artifact_key(file_key, name),
+            BytesIO(data),
+            length=len(data),
+            content_type=content_type,
+        )
+        record_minio_transfer("upload", len(data))
+
+
+def _read_object(object_name: str) -> bytes:
+    response = minio_client.get_object(BUCKET_NAME, object_name)
+    try:
+        data = response.read()
+    finally:
+        response.close()
+        response.release_conn()
+    record_minio_transfer("download", len(data))
+    return data
+
+
+def backfill_artifacts(db: Session, submission: Submission) -> bytes:
+    """
+    Derive and persist the artifacts of a submission uploaded before they
+    were computed at upload time. Returns the build context tar.
+    """
+    sources, tar_data, manifest = build_artifacts(_read_object(submission.file_key))
+    store_artifacts(submission.file_key, tar_data, manifest)
+    submission.encode_source = sources["encode.py"]
+    submission.decode_source = sources["decode.py"]
+    submission.source_etag = source_etag(sources)
+    db.commit()
+    logger.info(f"Backfilled artifacts for {submission.file_key}.")
+    return tar_data
+
+
+def load_build_context(db: Session, file_key: str) -> BytesIO:
+    try:
+        return BytesIO(_read_object(artifact_key(file_key, "context.tar")))
+    except S3Error as e:
+        if e.code != "NoSuchKey":
+            raise
+    submission = db.query(Submission).filter_by(file_key=file_key).first()
+    if submission is None:
+        raise InvalidSubmission(f"Unknown submission {file_key}.")
+    return BytesIO(backfill_artifacts(db, submission))
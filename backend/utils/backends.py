@@ -0,0 +1,321 @@
+import os
+import sys
+import uuid
+import shlex
+import shutil
+import logging
+import tarfile
+import tempfile
+import threading
+import subprocess
+from types import SimpleNamespace
+import docker
+import requests
+from minio.error import S3Error
+
+logger = logging.getLogger(__name__)
+
+
+class LazyClient:
+    """
+    Proxy for a storage or container client. The real client is built on
+    first use, so importing a module never connects to MinIO or Docker, and
+    override() swaps in another backend (e.g. for the offline harness).
+    """
+
+    def __init__(self, factory):
+        self._factory = factory
+        self._client = None
+        self._lock = threading.Lock()
+
+    def get(self):
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    self._client = self._factory()
+        return self._client
+
+    def override(self, client):
+        self._client = client
+
+    def __getattr__(self, name):
+        return getattr(self.get(), name)
+
+
+class LocalObjectResponse:
+    # Mirrors the urllib3 response returned by Minio.get_object
+    def __init__(self, path: str):
+        self._file = open(path, "rb")
+
+    def read(self, amt=None):
+        return self._file.read(amt)
+
+    def stream(self, amt=32 * 1024):
+        while chunk := self._file.read(amt):
+            yield chunk
+
+    def close(self):
+        self._file.close()
+
+    def release_conn(self):
+        pass
+
+
+class LocalObjectStore:
+    """
+    Local-filesystem stand-in for the subset of the Minio client API used by
+    the backend. Objects are stored at <root>/<bucket>/<object_name>.
+    """
+
+    def __init__(self, root: str):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+
+    def _path(self, bucket_name: str, object_name: str = "") -> str:
+        return os.path.join(self.root, bucket_name, object_name)
+
+    def _no_such_key(self, bucket_name: str, object_name: str):
+        return S3Error(
+            "NoSuchKey",
+            "Object does not exist",
+            f"/{bucket_name}/{object_name}",
+            None,
+            None,
+            None,
+            bucket_name,
+            object_name,
+        )
+
+    def _existing(self, bucket_name: str, object_name: str) -> str:
+        path = self._path(bucket_name, object_name)
+        if not os.path.isfile(path):
+            raise self._no_such_key(bucket_name, object_name)
+        return path
+
+    def bucket_exists(self, bucket_name: str) -> bool:
+        return os.path.isdir(self._path(bucket_name))
+
+    def make_bucket(self, bucket_name: str):
+        os.makedirs(self._path(bucket_name), exist_ok=True)
+
+    def stat_object(self, bucket_name: str, object_name: str):
+        path = self._existing(bucket_name, object_name)
+        return SimpleNamespace(
+            bucket_name=bucket_name,
+            object_name=object_name,
+            size=os.path.getsize(path),
+        )
+
+    def put_object(self, bucket_name, object_name, data, length, **kwargs):
+        path = self._path(bucket_name, object_name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as f:
+            if length < 0:
+                shutil.copyfileobj(data, f)
+            else:
+                remaining = length
+                while remaining > 0:
+                    chunk = data.read(min(remaining, 1024 * 1024))
+                    if not chunk:
+                        break
+                    f.write(chunk)
+                    remaining -= len(chunk)
+        return SimpleNamespace(bucket_name=bucket_name, object_name=object_name)
+
+    def fput_object(self, bucket_name, object_name, file_path, **kwargs):
+        path = self._path(bucket_name, object_name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        shutil.copyfile(file_path, path)
+
+    def get_object(self, bucket_name: str, object_name: str, **kwargs):
+        return LocalObjectResponse(self._existing(bucket_name, object_name))
+
+    def fget_object(self, bucket_name, object_name, file_path, **kwargs):
+        shutil.copyfile(self._existing(bucket_name, object_name), file_path)
+
+    def remove_object(self, bucket_name: str, object_name: str, **kwargs):
+        path = self._path(bucket_name, object_name)
+        if os.path.isfile(path):
+            os.remove(path)
+
+    def list_objects(self, bucket_name, prefix=None, recursive=False, **kwargs):
+        bucket_root = self._path(bucket_name)
+        prefix = prefix or ""
+        for dir_path, dir_names, file_names in os.walk(bucket_root):
+            dir_names.sort()
+            for file_name in sorted(file_names):
+                object_name = os.path.relpath(
+                    os.path.join(dir_path, file_name), bucket_root
+                ).replace(os.sep, "/")
+                if not object_name.startswith(prefix):
+                    continue
+                if not recursive and "/" in object_name[len(prefix) :]:
+                    continue
+                yield SimpleNamespace(
+                    bucket_name=bucket_name,
+                    object_name=object_name,
+                    size=os.path.getsize(os.path.join(dir_path, file_name)),
+                )
+
+
+class SubprocessContainerRunner:
+    """
+    Runs "containers" as local subprocesses, implementing the subset of the
+    docker.APIClient API used by the backend. Each image maps to a directory
+    the command runs in; bind-mount targets in the command line are rewritten
+    to their host paths and `python` resolves to the current interpreter.
+    """
+
+    def __init__(self, images: dict[str, str] | None = None, build_root=None):
+        self.images = {}
+        self._containers = {}
+        self.build_root = build_root
+        for image_name, directory in (images or {}).items():
+            self.register_image(image_name, directory)
+
+    @staticmethod
+    def _image_key(image_name: str) -> str:
+        return image_name.removesuffix(":latest")
+
+    def register_image(self, image_name: str, directory: str):
+        self.images[self._image_key(image_name)] = os.path.abspath(directory)
+
+    def _image_dir(self, image_name: str) -> str:
+        try:
+            return self.images[self._image_key(image_name)]
+        except KeyError:
+            raise docker.errors.ImageNotFound(
+                f"{image_name} is not available to the subprocess runner"
+            )
+
+    def inspect_image(self, image_name: str):
+        return {"Id": image_name, "Path": self._image_dir(image_name)}
+
+    def pull(self, image_name: str, **kwargs):
+        self._image_dir(image_name)
+
+    def get_image(self, image_name: str):
+        self._image_dir(image_name)
+        return iter([b""])
+
+    def build(self, fileobj=None, tag=None, **kwargs):
+        # The build context becomes the image directory; the Dockerfile is not
+        # run, so the context's dependencies must be installed locally.
+        if self.build_root:
+            os.makedirs(self.build_root, exist_ok=True)
+        image_dir = tempfile.mkdtemp(prefix="image-", dir=self.build_root)
+        with tarfile.open(fileobj=fileobj) as tar:
+            tar.extractall(image_dir, filter="data")
+        self.register_image(tag, image_dir)
+        yield {"stream": f"Registered {tag} from {image_dir}\n"}
+
+    def load_image(self, data, **kwargs):
+        return []
+
+    def remove_image(self, image, **kwargs):
+        pass
+
+    def create_host_config(self, binds=None, **kwargs):
+        return {"Binds": binds or {}, **kwargs}
+
+    def create_container(self, image, command, host_config=None, **kwargs):
+        container_id = uuid.uuid4().hex
+        self._containers[container_id] = {
+            "image": image,
+            "command": command,
+            "host_config": host_config or {},
+            "process": None,
+            "output": b"",
+            "labels": kwargs.get("labels") or {},
+        }
+        return {"Id": container_id}
+
+    def _args(self, container: dict) -> list[str]:
+        binds = container["host_config"].get("Binds", {})
+        mounts = {spec["bind"]: host_path for host_path, spec in binds.items()}
+        args = []
+        for arg in shlex.split(container["command"]):
+            for target, host_path in mounts.items():
+                if arg == target or arg.startswith(f"{target}/"):
+                    arg = host_path + arg[len(target) :]
+                    break
+            args.append(arg)
+        if args and args[0] == "python":
+            args[0] = sys.executable
+        return args
+
+    def start(self, container: str):
+        spec = self._containers[container]
+        spec["process"] = subprocess.Popen(
+            self._args(spec),
+            cwd=self._image_dir(spec["image"]),
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+        )
+
+    def wait(self, container: str, timeout=None, **kwargs):
+        spec = self._containers[container]
+        try:
+            output, _ = spec["process"].communicate(timeout=timeout)
+        except subprocess.TimeoutExpired:
+            # Same exception docker.APIClient.wait raises on timeout
+            raise requests.exceptions.ReadTimeout(f"{container} did not exit in time")
+        spec["output"] += output or b""
+        return {"StatusCode": spec["process"].returncode, "Error": None}
+
+    def inspect_container(self, container: str):
+        process = self._containers[container]["process"]
+        return {
+            "State": {
+                "Running": process is not None and process.poll() is None,
+                "ExitCode": process.returncode if process is not None else None,
+                "OOMKilled": False,
+            }
+        }
+
+    def stats(self, container: str, stream=True, **kwargs):
+        # A snapshot of the process's peak resident memory and CPU time, in
+        # the fields of a Docker stats entry; empty once it exited
+        process = self._containers[container]["process"]
+        try:
+            with open(f"/proc/{process.pid}/status") as f:
+                status = dict(line.split(":", 1) for line in f if ":" in line)
+            with open(f"/proc/{process.pid}/stat") as f:
+                fields = f.read().rsplit(")", 1)[1].split()
+        except (AttributeError, OSError):
+            return {}
+        if "VmHWM" not in status:
+            return {}
+        cpu_ticks = int(fields[11]) + int(fields[12])
+        return {
+            "memory_stats": {"usage": int(status["VmHWM"].split()[0]) * 1024},
+            "cpu_stats": {
+                "cpu_usage": {
+                    "total_usage": cpu_ticks * 10**9 // os.sysconf("SC_CLK_TCK")
+                }
+            },
+        }
+
+    def containers(self, all=False, filters=None, **kwargs):
+        labels = (filters or {}).get("label", [])
+        labels = [labels] if isinstance(labels, str) else labels
+        matches = []
+        for container_id, spec in self._containers.items():
+            container_labels = {f"{k}={v}" for k, v in spec["labels"].items()}
+            if container_labels.issuperset(labels):
+                matches.append({"Id": container_id, "Labels": spec["labels"]})
+        return matches
+
+    def logs(self, container: str, **kwargs) -> bytes:
+        return self._containers[container]["output"]
+
+    def kill(self, container: str, **kwargs):
+        process = self._containers[container]["process"]
+        if process is not None and process.poll() is None:
+            process.kill()
+            process.wait()
+
+    def remove_container(self, container: str, force=False, **kwargs):
+        if force:
+            self.kill(container)
+        self._containers.pop(container, None)
@@ -0,0 +1,94 @@
+import os
+import logging
+import docker
+from sqlalchemy.orm import Session
+from models.schema import Submission, TestResult
+from utils.docker import docker_client, save_and_push_internal_image
+from utils.artifacts import source_etag
+
+BASELINES_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "baselines")
+
+# Codecs implemented in baselines/main.py, each built into its own image
+BASELINE_CODECS = [
+    "raw",
+    "zlib",
+    "zstd-1",
+    "zstd-3",
+    "zstd-9",
+    "zstd-19",
+    "numpress-linear",
+    "numpress-slof",
+    "numpress-pic",
+    "truncate-f32",
+    "truncate-m10",
+]
+
+logger = logging.getLogger(__name__)
+
+
+def baseline_key(codec: str) -> str:
+    return f"baseline-{codec}"
+
+
+def baseline_sources(codec: str) -> dict:
+    # Shown on the submission page; one transform implements both directions
+    with open(os.path.join(BASELINES_DIR, "main.py")) as f:
+        source = f"# CODEC={codec}\n{f.read()}"
+    return {"encode.py": source, "decode.py": source}
+
+
+def register_baseline(db_session: Session, codec: str) -> Submission:
+    file_key = baseline_key(codec)
+    sources = baseline_sources(codec)
+    etag = source_etag(sources)
+    submission = db_session.query(Submission).filter_by(file_key=file_key).first()
+    if not submission:
+        submission = Submission(
+            file_key=file_key,
+            email="baseline@localhost",
+            name="Reference",
+            submission_name=codec,
+            is_baseline=True,
+        )
+        db_session.add(submission)
+    elif submission.source_etag == etag:
+        return submission
+
+    # Baselines have no uploaded zip for /submission-source to fall back on
+    submission.encode_source = sources["encode.py"]
+    submission.decode_source = sources["decode.py"]
+    submission.source_etag = etag
+    db_session.commit()
+    return submission
+
+
+def baseline_benchmarked(db_session: Session, codec: str) -> bool:
+    return (
+        db_session.query(TestResult)
+        .filter_by(submission_id=baseline_key(codec), status="success")
+        .first()
+        is not None
+    )
+
+
+def build_baseline_image(codec: str) -> bool:
+    image_name = f"transform-{baseline_key(codec)}"
+    try:
+        build_output = docker_client.build(
+            path=BASELINES_DIR,
+            buildargs={"CODEC": codec},
+            tag=f"{image_name}:latest",
+            rm=True,
+            decode=True,
+        )
+        for chunk in build_output:
+            if "error" in chunk:
+                logger.error(f"Failed to build {image_name}: {chunk['error'].strip()}")
+                return False
+    except docker.errors.APIError as e:
+        logger.error(f"Docker build failed for {image_name}: {e}")
+        return False
+
+    save_and_push_internal_image(image_name=image_name)
+    logger.info(f"Built baseline image {image_name}.")
+    return True
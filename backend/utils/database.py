@@ -1,11 +1,66 @@
+import logging
+from contextlib import contextmanager
+from sqlalchemy import inspect, text
 from models.schema import SessionLocal, Base, engine
 
-def get_db():
+logger = logging.getLogger(__name__)
+
+
+@contextmanager
+def session_scope():
+    """
+    Session for the duration of the block, rolled back on error and always
+    closed so its connection goes back to the pool.
+    """
     db = SessionLocal()
     try:
         yield db
+    except Exception:
+        db.rollback()
+        raise
     finally:
         db.close()
 
+
+def get_db():
+    with session_scope() as db:
+        yield db
+
+
+def reset_engine_after_fork():
+    # Connections inherited from the parent process must not be reused by the
+    # child; drop them without closing the parent's sockets.
+    engine.dispose(close=False)
+
+
+def add_missing_columns():
+    """
+    create_all only creates missing tables. Add the columns introduced since an
+    existing table was created (nullable, without backfill) and their indexes.
+    Safe to run on every start.
+    """
+    preparer = engine.dialect.identifier_preparer
+    inspector = inspect(engine)
+    with engine.begin() as connection:
+        for table in Base.metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+            existing = {column["name"] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing:
+                    continue
+                column_type = column.type.compile(dialect=engine.dialect)
+                connection.execute(
+                    text(
+                        f"ALTER TABLE {preparer.format_table(table)} ADD COLUMN "
+                        f"{preparer.quote(column.name)} {column_type}"
+                    )
+                )
+                logger.info(f"Added column {table.name}.{column.name}.")
+            for index in table.indexes:
+                index.create(connection, checkfirst=True)
+
+
 def init_db():
     Base.metadata.create_all(bind=engine)
+    add_missing_columns()
@@ -1,10 +1,13 @@
 import docker
 import logging
 from io import BytesIO
+from utils.backends import LazyClient
 from utils.minio import minio_client, CONTAINER_BUCKET
 from minio.error import S3Error
+from utils.telemetry import stage, record_minio_transfer
 
-docker_client = docker.APIClient()
+# Connected on first use rather than at import
+docker_client = LazyClient(docker.APIClient)
 logger = logging.getLogger(__name__)
 
 
@@ -30,6 +33,7 @@ def save_and_push_internal_image(image_name: str):
             length=len(image_bytes.getvalue()),
             content_type="application/x-tar"
         )
+        record_minio_transfer("upload", len(image_bytes.getvalue()))
     except S3Error as e:
         logger.error(f"MinIO error while saving Docker image: {e}")
     except docker.errors.DockerException as e:
@@ -38,6 +42,7 @@ def save_and_push_internal_image(image_name: str):
         logger.error(f"Unexpected error while saving Docker image: {e}")
 
 
+@stage("image_load")
 def check_and_pull_internal_image(image_name: str):
     try:
         docker_client.inspect_image(image_name)
@@ -47,6 +52,7 @@ def check_and_pull_internal_image(image_name: str):
             downloaded_image = BytesIO()
             for chunk in response.stream(32 * 1024):
                 downloaded_image.write(chunk)
+            record_minio_transfer("download", downloaded_image.tell())
             downloaded_image.seek(0)
         except Exception as e:
             logging.error(f"Error downloading {image_name} from MinIO: {e}")
@@ -0,0 +1,197 @@
+import os
+import socket
+import logging
+import threading
+from datetime import datetime, timezone
+from statistics import median
+import docker
+from sqlalchemy.orm import Session
+from sqlalchemy.exc import SQLAlchemyError
+from models.schema import BenchmarkRun, Submission
+from utils.docker import docker_client
+from utils.telemetry import BENCHMARK_DRIFT
+from utils.watchdog import stage_budget, TIMED_CPUSET
+
+# Reference (baseline) runs are compared with the median of their previous
+# DRIFT_WINDOW runs on the same dataset version; a relative deviation above
+# DRIFT_THRESHOLD in either runtime flags the run and the host it ran on.
+DRIFT_THRESHOLD = float(os.environ.get("DRIFT_THRESHOLD", 0.25))
+DRIFT_WINDOW = int(os.environ.get("DRIFT_WINDOW", 10))
+DRIFT_MIN_RUNS = 3
+
+# Seconds between container stats reads during a timed run. The reads (and
+# the work they cause in dockerd) would compete with the timed container, so
+# runs are only sampled when TIMED_CPUSET keeps it on cores of its own.
+CONTAINER_STATS_INTERVAL = float(os.environ.get("CONTAINER_STATS_INTERVAL", 0.5))
+
+logger = logging.getLogger(__name__)
+
+
+def host_name() -> str:
+    # NODE_NAME distinguishes benchmark nodes when containers share a hostname
+    return os.environ.get("NODE_NAME") or socket.gethostname()
+
+
+def image_digest(image_name: str) -> str | None:
+    try:
+        return docker_client.inspect_image(image_name).get("Id")
+    except docker.errors.APIError as e:
+        logger.error(f"Failed to inspect {image_name}: {e}")
+        return None
+
+
+def resource_snapshot() -> dict:
+    load_1m, load_5m, load_15m = os.getloadavg()
+    return {
+        "cpu_count": os.cpu_count(),
+        "load_avg": [load_1m, load_5m, load_15m],
+        "mem_limit": {
+            stage_name: stage_budget(stage_name)[1]
+            for stage_name in ("encode", "decode")
+        },
+    }
+
+
+def usage_sampling_enabled() -> bool:
+    return bool(TIMED_CPUSET)
+
+
+def _memory_in_use(memory_stats: dict) -> int | None:
+    # As `docker stats` reports it: usage without the inactive page cache
+    usage = memory_stats.get("usage")
+    if not usage:
+        return None
+    stats = memory_stats.get("stats") or {}
+    return usage - stats.get("inactive_file", stats.get("total_inactive_file", 0))
+
+
+class ContainerUsage:
+    """
+    Samples a container's stats in a background thread while it runs and
+    keeps its peak memory in use and the CPU time it consumed. Being sampled,
+    spikes shorter than the interval and CPU time after the last read can be
+    missed.
+    """
+
+    def __init__(self, container_id: str, interval: float = CONTAINER_STATS_INTERVAL):
+        self.container_id = container_id
+        self.interval = interval
+        self.peak_memory = None
+        self.cpu_seconds = None
+        self._one_shot = True
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stopped.set()
+        self._thread.join()
+
+    def _read(self):
+        try:
+            stats = docker_client.stats(
+                self.container_id, stream=False, one_shot=self._one_shot or None
+            )
+        except docker.errors.InvalidVersion:
+            # one_shot needs API 1.41; without it each read takes ~1s
+            self._one_shot = False
+            return
+        memory = _memory_in_use(stats.get("memory_stats") or {})
+        if memory:
+            self.peak_memory = max(self.peak_memory or 0, memory)
+        cpu_usage = (stats.get("cpu_stats") or {}).get("cpu_usage") or {}
+        if cpu_usage.get("total_usage"):
+            self.cpu_seconds = max(
+                self.cpu_seconds or 0, cpu_usage["total_usage"] / 1e9
+            )
+
+    def _sample(self):
+        while True:
+            try:
+                self._read()
+            except Exception as e:
+                logger.debug(f"Failed to read stats of {self.container_id}: {e}")
+            if self._stopped.wait(self.interval):
+                return
+
+    def summary(self) -> dict:
+        return {"peak_memory_bytes": self.peak_memory, "cpu_seconds": self.cpu_seconds}
+
+
+def _deviation(value: float | None, history: list[float | None]) -> float | None:
+    history = [sample for sample in history if sample]
+    if value is None or len(history) < DRIFT_MIN_RUNS:
+        return None
+    reference = median(history)
+    return (value - reference) / reference
+
+
+def check_drift(db_session: Session, run: BenchmarkRun) -> bool:
+    """
+    Compare a reference run with its history and flag it when it drifted.
+    Returns whether the run was flagged.
+    """
+    previous = (
+        db_session.query(BenchmarkRun)
+        .filter(
+            BenchmarkRun.submission_id == run.submission_id,
+            BenchmarkRun.dataset_version == run.dataset_version,
+            BenchmarkRun.id != run.id,
+        )
+        .order_by(BenchmarkRun.created_at.desc())
+        .limit(DRIFT_WINDOW)
+        .all()
+    )
+    deviations = [
+        deviation
+        for deviation in (
+            _deviation(run.encoding_runtime, [r.encoding_runtime for r in previous]),
+            _deviation(run.decoding_runtime, [r.decoding_runtime for r in previous]),
+        )
+        if deviation is not None
+    ]
+    if not deviations:
+        return False
+
+    run.drift = max(deviations, key=abs)
+    run.drift_flagged = abs(run.drift) > DRIFT_THRESHOLD
+    if run.drift_flagged:
+        BENCHMARK_DRIFT.labels(host=run.host).inc()
+        logger.warning(
+            f"Reference {run.submission_id} drifted {run.drift:+.1%} on {run.host} "
+            f"(threshold {DRIFT_THRESHOLD:.0%}, {len(previous)} previous runs)."
+        )
+    return run.drift_flagged
+
+
+def record_benchmark_run(
+    db_session: Session, submission_id: str, resources: dict, **fields
+):
+    """
+    Append a BenchmarkRun for the submission, checking reference submissions
+    for drift against their history.
+    """
+    try:
+        run = BenchmarkRun(
+            submission_id=submission_id,
+            created_at=datetime.now(timezone.utc),
+            host=host_name(),
+            resources=resources,
+            **fields,
+        )
+        db_session.add(run)
+        db_session.flush()
+
+        submission = db_session.get(Submission, submission_id)
+        if submission is not None and submission.is_baseline:
+            check_drift(db_session, run)
+        db_session.commit()
+        logger.info(f"Recorded benchmark run {run.id} for {submission_id}.")
+        return run
+    except SQLAlchemyError as e:
+        db_session.rollback()
+        logger.error(f"Failed to record benchmark run for {submission_id}: {e}")
+        return None
@@ -1,23 +1,31 @@
 from minio import Minio
 from minio.error import S3Error
+from utils.backends import LazyClient
 
 BUCKET_NAME = "submission-uploads"
 RUN_BUCKET = "run-bucket"
 CONTAINER_BUCKET = "container-bucket"
+BUCKETS = [BUCKET_NAME, RUN_BUCKET, CONTAINER_BUCKET]
 
-minio_client = Minio(
-    "minio:9000",
-    access_key="admin",
-    secret_key="password",
-    secure=False,
-)
 
-def initialize_buckets(buckets: list[str]):
+def create_minio_client() -> Minio:
+    # Buckets are created by bootstrap.py, not on every connect
+    return Minio(
+        "minio:9000",
+        access_key="admin",
+        secret_key="password",
+        secure=False,
+    )
+
+
+# Connected on first use rather than at import
+minio_client = LazyClient(create_minio_client)
+
+
+def initialize_buckets(buckets: list[str], client=minio_client):
     try:
         for bucket in buckets:
-            if not minio_client.bucket_exists(bucket):
-                minio_client.make_bucket(bucket)
+            if not client.bucket_exists(bucket):
+                client.make_bucket(bucket)
     except S3Error as e:
         print(f"Error initializing buckets: {e}")
-
-initialize_buckets([BUCKET_NAME, RUN_BUCKET, CONTAINER_BUCKET])
\ No newline at end of file
@@ -0,0 +1,372 @@
+"""
+Streaming mzML deconstruct/construct, an in-process alternative to the
+chrisagrams/mzml-construct container.
+
+Deconstruct splits an mzML file into an XML skeleton, where every <binary>
+element is replaced by <binary points="N"></binary>, and a flat float64
+.npy holding the decoded arrays in document order. Construct reverses it,
+re-encoding each array with the precision and compression its
+binaryDataArray declares and rewriting the indexedmzML offsets and checksum.
+
+Files are processed chunk by chunk. Binary arrays are decoded and encoded
+in batches, optionally across a process pool, and only a bounded number of
+batches is in flight at a time.
+"""
+
+import os
+import re
+import zlib
+import base64
+import hashlib
+import logging
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+
+CHUNK_SIZE = 16 * 1024 * 1024
+BATCH_SIZE = 512
+
+ARRAY_START_RE = re.compile(rb"<binaryDataArray[\s>]")
+ARRAY_END = b"</binaryDataArray>"
+
+DTYPES = {
+    "MS:1000521": "<f4",  # 32-bit float
+    "MS:1000523": "<f8",  # 64-bit float
+    "MS:1000519": "<i4",  # 32-bit integer
+    "MS:1000522": "<i8",  # 64-bit integer
+}
+COMPRESSIONS = {
+    "MS:1000574": "zlib",
+    "MS:1000576": "none",
+}
+
+ACCESSION_RE = re.compile(rb'accession="([^"]+)"')
+POINTS_RE = re.compile(rb'<binary points="(\d+)">')
+ENCODED_LENGTH_RE = re.compile(rb'encodedLength="\d+"')
+OFFSET_TARGET_RE = re.compile(rb'<(?:spectrum|chromatogram)\s[^>]*?\bid="([^"]*)"')
+INDEX_OFFSET_RE = re.compile(rb'(<offset\s+idRef="([^"]*)"[^>]*>)\d+(</offset>)')
+INDEX_LIST_OFFSET_RE = re.compile(rb"(<indexListOffset>)\d+(</indexListOffset>)")
+CHECKSUM_RE = re.compile(rb"(<fileChecksum>)[0-9a-fA-F]*(</fileChecksum>)")
+
+logger = logging.getLogger(__name__)
+
+
+def _split_fragments(file, chunk_size=CHUNK_SIZE):
+    """
+    Yield ("text", bytes) and ("array", bytes) pieces covering the file in
+    order. Text pieces always end right before a "<", so they never split a
+    tag; array pieces are whole <binaryDataArray> elements.
+    """
+    buffer = b""
+    position = 0
+    eof = False
+    while True:
+        match = ARRAY_START_RE.search(buffer, position)
+        if match:
+            start = match.start()
+            end = buffer.find(ARRAY_END, start)
+            if end >= 0:
+                end += len(ARRAY_END)
+                if start > position:
+                    yield "text", buffer[position:start]
+                yield "array", buffer[start:end]
+                position = end
+                continue
+        elif not eof:
+            # Keep everything from the last tag start for the next round
+            cut = buffer.rfind(b"<", position)
+            if cut > position:
+                yield "text", buffer[position:cut]
+                position = cut
+
+        if eof:
+            if position < len(buffer):
+                yield "text", buffer[position:]
+            return
+        chunk = file.read(chunk_size)
+        if not chunk:
+            eof = True
+        buffer = buffer[position:] + chunk
+        position = 0
+
+
+def _array_metadata(head: bytes) -> tuple[str, str]:
+    accessions = {a.decode() for a in ACCESSION_RE.findall(head)}
+    dtype = next((DTYPES[a] for a in accessions if a in DTYPES), None)
+    if dtype is None:
+        raise ValueError("binaryDataArray without a supported precision")
+    compression = next((COMPRESSIONS[a] for a in accessions if a in COMPRESSIONS), None)
+    if compression is None:
+        raise ValueError(
+            "binaryDataArray compression not supported (only zlib or none)"
+        )
+    return dtype, compression
+
+
+def _split_binary(fragment: bytes) -> tuple[bytes, bytes, bytes]:
+    """
+    Split a <binaryDataArray> fragment into the markup before <binary>, the
+    base64 payload and the markup after </binary>.
+    """
+    # </binaryDataArray> does not match, so the last "<binary" is the element
+    start = fragment.rfind(b"<binary")
+    tag_end = fragment.index(b">", start)
+    if fragment[tag_end - 1 : tag_end] == b"/":
+        return fragment[:start], b"", fragment[tag_end + 1 :]
+    end = fragment.index(b"</binary>", tag_end)
+    return fragment[:start], fragment[tag_end + 1 : end], fragment[end + 9 :]
+
+
+def _decode_batch(items: list[tuple[bytes, str, str]]):
+    arrays = []
+    for payload, dtype, compression in items:
+        data = base64.b64decode(payload)
+        if compression == "zlib":
+            data = zlib.decompress(data)
+        arrays.append(np.frombuffer(data, dtype=dtype))
+    lengths = [array.size for array in arrays]
+    values = np.concatenate(arrays).astype(np.float64) if arrays else np.empty(0)
+    return values, lengths
+
+
+def _encode_batch(values: np.ndarray, items: list[tuple[int, str, str]]):
+    payloads = []
+    offset = 0
+    for points, dtype, compression in items:
+        data = values[offset : offset + points].astype(dtype).tobytes()
+        offset += points
+        if compression == "zlib":
+            data = zlib.compress(data)
+        payloads.append(base64.b64encode(data))
+    return payloads
+
+
+class _BatchPipeline:
+    """
+    Runs batches inline or on a process pool, keeping results in submission
+    order and at most max_pending batches in flight.
+    """
+
+    def __init__(self, workers: int):
+        self.executor = ProcessPoolExecutor(workers) if workers > 1 else None
+        self.max_pending = max(2 * workers, 1)
+        self.pending = deque()
+
+    def submit(self, func, args, context):
+        if self.executor is None:
+            self.pending.append((None, func(*args), context))
+        else:
+            self.pending.append((self.executor.submit(func, *args), None, context))
+        while len(self.pending) > self.max_pending:
+            yield self._pop()
+
+    def drain(self):
+        while self.pending:
+            yield self._pop()
+
+    def _pop(self):
+        future, result, context = self.pending.popleft()
+        return (future.result() if future is not None else result), context
+
+    def close(self):
+        if self.executor is not None:
+            self.executor.shutdown()
+
+
+def _default_workers() -> int:
+    return int(os.environ.get("MZML_WORKERS", os.cpu_count() or 1))
+
+
+def deconstruct(
+    mzml_path: str,
+    xml_path: str,
+    npy_path: str,
+    workers: int = None,
+    batch_size: int = BATCH_SIZE,
+) -> int:
+    """
+    Split mzml_path into an XML skeleton and a flat float64 .npy of every
+    binary array. Returns the number of data points written.
+    """
+    workers = workers or _default_workers()
+    pipeline = _BatchPipeline(workers)
+    raw_path = f"{npy_path}.raw"
+    total_points = 0
+
+    def write_batch(result, context):
+        nonlocal total_points
+        values, lengths = result
+        raw_file.write(values.tobytes())
+        total_points += values.size
+        for (text, head, tail), points in zip(context, lengths):
+            xml_file.write(text)
+            xml_file.write(head)
+            xml_file.write(b'<binary points="%d"></binary>' % points)
+            xml_file.write(tail)
+
+    try:
+        with open(mzml_path, "rb") as mzml_file, open(xml_path, "wb") as xml_file, open(
+            raw_path, "wb"
+        ) as raw_file:
+            items, context, text = [], [], b""
+            for kind, piece in _split_fragments(mzml_file):
+                if kind == "text":
+                    text += piece
+                    if not items and not pipeline.pending:
+                        xml_file.write(text)
+                        text = b""
+                    continue
+
+                head, payload, tail = _split_binary(piece)
+                dtype, compression = _array_metadata(head)
+                items.append((payload, dtype, compression))
+                context.append((text, head, tail))
+                text = b""
+                if len(items) >= batch_size:
+                    for result in pipeline.submit(_decode_batch, (items,), context):
+                        write_batch(*result)
+                    items, context = [], []
+
+            if items:
+                for result in pipeline.submit(_decode_batch, (items,), context):
+                    write_batch(*result)
+            for result in pipeline.drain():
+                write_batch(*result)
+            xml_file.write(text)
+
+        # Prepend the .npy header now that the length is known
+        with open(npy_path, "wb") as npy_file, open(raw_path, "rb") as raw_file:
+            np.lib.format.write_array_header_1_0(
+                npy_file,
+                {"descr": "<f8", "fortran_order": False, "shape": (total_points,)},
+            )
+            while chunk := raw_file.read(CHUNK_SIZE):
+                npy_file.write(chunk)
+    finally:
+        pipeline.close()
+        if os.path.exists(raw_path):
+            os.remove(raw_path)
+
+    logger.info(f"Deconstructed {mzml_path} into {total_points} data points.")
+    return total_points
+
+
+class _IndexedWriter:
+    """
+    Output stream that tracks byte offsets of spectra and chromatograms and
+    rewrites the indexedmzML index, index offset and SHA-1 checksum.
+    """
+
+    def __init__(self, file):
+        self.file = file
+        self.position = 0
+        self.sha1 = hashlib.sha1()
+        self.offsets = {}
+        self.index_tail = None
+
+    def write(self, data: bytes):
+        if self.index_tail is not None:
+            self.index_tail += data
+            return
+        start = data.find(b"<indexList")
+        if start >= 0:
+            self.index_tail = data[start:]
+            data = data[:start]
+        for match in OFFSET_TARGET_RE.finditer(data):
+            self.offsets[match.group(1)] = self.position + match.start()
+        self.file.write(data)
+        self.sha1.update(data)
+        self.position += len(data)
+
+    def close(self):
+        if self.index_tail is None:
+            return
+        index_offset = self.position
+        tail = INDEX_OFFSET_RE.sub(
+            lambda m: m.group(1)
+            + str(self.offsets.get(m.group(2), 0)).encode()
+            + m.group(3),
+            self.index_tail,
+        )
+        tail = INDEX_LIST_OFFSET_RE.sub(
+            lambda m: m.group(1) + str(index_offset).encode() + m.group(2), tail
+        )
+        checksum_at = tail.find(b"<fileChecksum>")
+        if checksum_at >= 0:
+            checksum_at += len(b"<fileChecksum>")
+            self.sha1.update(tail[:checksum_at])
+            tail = CHECKSUM_RE.sub(
+                lambda m: m.group(1) + self.sha1.hexdigest().encode() + m.group(2),
+                tail,
+            )
+        self.file.write(tail)
+
+
+def construct(
+    xml_path: str,
+    npy_path: str,
+    mzml_path: str,
+    workers: int = None,
+    batch_size: int = BATCH_SIZE,
+):
+    """
+    Rebuild an mzML file from a skeleton written by deconstruct() and a
+    (possibly transformed) flat .npy with the same number of data points.
+    """
+    values = np.load(npy_path, mmap_mode="r", allow_pickle=False).reshape(-1)
+    workers = workers or _default_workers()
+    pipeline = _BatchPipeline(workers)
+    offset = 0
+
+    def write_batch(payloads, context):
+        for (text, head, tail), payload in zip(context, payloads):
+            writer.write(text)
+            writer.write(
+                ENCODED_LENGTH_RE.sub(b'encodedLength="%d"' % len(payload), head, 1)
+            )
+            writer.write(b"<binary>" + payload + b"</binary>")
+            writer.write(tail)
+
+    def submit(items, context, start):
+        batch = np.asarray(values[start:offset], dtype=np.float64)
+        yield from pipeline.submit(_encode_batch, (batch, items), context)
+
+    try:
+        with open(xml_path, "rb") as xml_file, open(mzml_path, "wb") as mzml_file:
+            writer = _IndexedWriter(mzml_file)
+            items, context, text, batch_start = [], [], b"", 0
+            for kind, piece in _split_fragments(xml_file):
+                if kind == "text":
+                    text += piece
+                    if not items and not pipeline.pending:
+                        writer.write(text)
+                        text = b""
+                    continue
+
+                head, _, tail = _split_binary(piece)
+                points = int(POINTS_RE.match(piece, len(head)).group(1))
+                dtype, compression = _array_metadata(head)
+                items.append((points, dtype, compression))
+                context.append((text, head, tail))
+                text = b""
+                offset += points
+                if len(items) >= batch_size:
+                    for result in submit(items, context, batch_start):
+                        write_batch(*result)
+                    items, context, batch_start = [], [], offset
+
+            if items:
+                for result in submit(items, context, batch_start):
+                    write_batch(*result)
+            for result in pipeline.drain():
+                write_batch(*result)
+            writer.write(text)
+            writer.close()
+    finally:
+        pipeline.close()
+
+    if offset != values.size:
+        raise ValueError(
+            f"{npy_path} has {values.size} data points, skeleton expects {offset}"
+        )
+    logger.info(f"Constructed {mzml_path} from {offset} data points.")
@@ -0,0 +1,89 @@
+import os
+import logging
+from shutil import copy2, rmtree
+from minio.error import S3Error
+from utils.minio import minio_client
+from utils.telemetry import record_minio_transfer
+
+# Worker-local store used to hand intermediates (new.npy) between tasks
+# running on the same node. Point SCRATCH_DIR at a tmpfs mount to keep
+# them in memory; leave it unset to always go through MinIO.
+SCRATCH_DIR = os.environ.get("SCRATCH_DIR")
+
+logger = logging.getLogger(__name__)
+
+
+def scratch_enabled() -> bool:
+    return bool(SCRATCH_DIR)
+
+
+def scratch_path(bucket: str, object_name: str) -> str:
+    return os.path.join(SCRATCH_DIR, bucket, object_name)
+
+
+def _link_or_copy(src: str, dst: str):
+    os.makedirs(os.path.dirname(dst), exist_ok=True)
+    if os.path.exists(dst):
+        os.remove(dst)
+    try:
+        os.link(src, dst)
+    except OSError:
+        # Different filesystems (e.g. tmpfs scratch and /tmp bind dirs)
+        copy2(src, dst)
+
+
+def stage_intermediate(
+    bucket: str, object_name: str, file_path: str, local: bool = True
+):
+    """
+    Hand a file produced by one stage to the next one. Kept in scratch when
+    enabled and the next stage runs on this node (local), otherwise uploaded
+    to MinIO.
+    """
+    if scratch_enabled() and local:
+        _link_or_copy(file_path, scratch_path(bucket, object_name))
+        logger.info(f"Staged {object_name} in scratch.")
+        return
+
+    file_size = os.stat(file_path).st_size
+    with open(file_path, "rb") as file_data:
+        minio_client.put_object(
+            bucket,
+            object_name,
+            data=file_data,
+            length=file_size,
+        )
+    record_minio_transfer("upload", file_size)
+    logger.info(f"Staged {object_name} in MinIO.")
+
+
+def fetch_intermediate(bucket: str, object_name: str, file_path: str):
+    """
+    Materialize an intermediate at file_path, preferring the local scratch copy
+    and falling back to MinIO when the producing stage ran on another node.
+    """
+    if scratch_enabled():
+        local_path = scratch_path(bucket, object_name)
+        if os.path.exists(local_path):
+            _link_or_copy(local_path, file_path)
+            return
+        logger.info(f"{object_name} not in scratch, falling back to MinIO.")
+
+    minio_client.fget_object(bucket, object_name, file_path)
+    record_minio_transfer("download", os.path.getsize(file_path))
+
+
+def release_intermediate(bucket: str, object_name: str):
+    if scratch_enabled():
+        local_path = scratch_path(bucket, object_name)
+        if os.path.exists(local_path):
+            os.remove(local_path)
+    try:
+        minio_client.remove_object(bucket, object_name)
+    except S3Error as e:
+        logger.error(f"MinIO error: {e}")
+
+
+def clear_scratch(bucket: str, prefix: str):
+    if scratch_enabled():
+        rmtree(scratch_path(bucket, prefix), ignore_errors=True)
@@ -0,0 +1,139 @@
+import os
+import time
+import logging
+from contextlib import contextmanager
+
+# Shared by the processes of one container (uvicorn, or a Celery worker and
+# its prefork children) so their samples can be aggregated. Each container
+# needs its own directory: file names only carry the PID. Mount it as tmpfs
+# so it starts empty. Must exist before prometheus_client creates any metric.
+PROMETHEUS_MULTIPROC_DIR = os.environ.get("PROMETHEUS_MULTIPROC_DIR")
+if PROMETHEUS_MULTIPROC_DIR:
+    os.makedirs(PROMETHEUS_MULTIPROC_DIR, exist_ok=True)
+
+from prometheus_client import (
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Histogram,
+    multiprocess,
+    start_http_server,
+)
+from opentelemetry import trace
+from opentelemetry.sdk.resources import Resource
+from opentelemetry.sdk.trace import TracerProvider
+from opentelemetry.sdk.trace.export import BatchSpanProcessor
+
+STAGE_BUCKETS = (0.1, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1800, 3600, 7200)
+
+STAGE_LATENCY = Histogram(
+    "mecs_stage_duration_seconds",
+    "Wall time of each pipeline stage.",
+    ["stage"],
+    buckets=STAGE_BUCKETS,
+)
+MINIO_BYTES = Counter(
+    "mecs_minio_bytes_total",
+    "Bytes transferred to and from MinIO.",
+    ["direction"],
+)
+MINIO_UPLOAD_THROUGHPUT = Histogram(
+    "mecs_minio_upload_throughput_bytes_per_second",
+    "Throughput of bulk uploads to MinIO.",
+    buckets=(1e6, 5e6, 1e7, 5e7, 1e8, 2.5e8, 5e8, 1e9),
+)
+CONTAINER_START_SECONDS = Histogram(
+    "mecs_container_start_seconds",
+    "Time for the Docker daemon to start a container.",
+    ["stage"],
+    buckets=(0.05, 0.1, 0.25, 0.5, 1, 2, 5, 10),
+)
+BENCHMARK_DRIFT = Counter(
+    "mecs_benchmark_drift_total",
+    "Reference benchmark runs whose timings drifted beyond the threshold.",
+    ["host"],
+)
+DB_CHECKOUT_SECONDS = Histogram(
+    "mecs_db_pool_checkout_seconds",
+    "Time waiting to check a connection out of the database pool.",
+    buckets=(0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5, 30),
+)
+DB_CHECKOUT_TIMEOUTS = Counter(
+    "mecs_db_pool_checkout_timeouts_total",
+    "Database pool checkouts that timed out waiting for a connection.",
+)
+
+tracer = trace.get_tracer("mecs")
+
+# Lists receiving (stage, seconds) for every finished stage, see record_stages
+_stage_recorders = []
+
+logger = logging.getLogger(__name__)
+
+
+def init_tracing(service_name: str):
+    """
+    Install the tracer provider for this process. Spans are exported over
+    OTLP when OTEL_EXPORTER_OTLP_ENDPOINT is set and dropped otherwise.
+    """
+    provider = TracerProvider(resource=Resource.create({"service.name": service_name}))
+    if os.environ.get("OTEL_EXPORTER_OTLP_ENDPOINT"):
+        from opentelemetry.exporter.otlp.proto.http.trace_exporter import (
+            OTLPSpanExporter,
+        )
+
+        provider.add_span_processor(BatchSpanProcessor(OTLPSpanExporter()))
+    trace.set_tracer_provider(provider)
+
+
+def instrument_celery():
+    # Injects the trace context into task headers on publish and resumes it
+    # in the worker, so one submission is one trace across the whole chain.
+    from opentelemetry.instrumentation.celery import CeleryInstrumentor
+
+    CeleryInstrumentor().instrument()
+
+
+def serve_metrics(port: int):
+    """
+    Serve this container's metrics over HTTP, for processes without an API
+    (Celery workers). Started once, in the parent process.
+    """
+    if PROMETHEUS_MULTIPROC_DIR:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    start_http_server(port, registry=registry)
+    logger.info(f"Serving metrics on port {port}.")
+
+
+@contextmanager
+def stage(name: str, **attributes):
+    with tracer.start_as_current_span(name, attributes=attributes) as span:
+        start_time = time.perf_counter()
+        try:
+            yield span
+        finally:
+            duration = time.perf_counter() - start_time
+            STAGE_LATENCY.labels(stage=name).observe(duration)
+            for recorder in _stage_recorders:
+                recorder.append((name, duration))
+
+
+@contextmanager
+def record_stages():
+    """
+    Collect the (stage, seconds) of every stage finished in this process
+    while the context is active. Used for timing breakdowns outside Prometheus.
+    """
+    timings = []
+    _stage_recorders.append(timings)
+    try:
+        yield timings
+    finally:
+        _stage_recorders.remove(timings)
+
+
+def record_minio_transfer(direction: str, num_bytes: int):
+    MINIO_BYTES.labels(direction=direction).inc(num_bytes)
@@ -0,0 +1,93 @@
+import os
+import time
+import logging
+import threading
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from utils.minio import minio_client
+from utils.telemetry import record_minio_transfer, MINIO_UPLOAD_THROUGHPUT
+
+# Concurrent uploads per bulk transfer. The Minio client keeps at most 10
+# pooled connections per host, so going above that only queues requests.
+TRANSFER_WORKERS = int(os.environ.get("TRANSFER_WORKERS", 8))
+
+logger = logging.getLogger(__name__)
+
+
+def _report(bucket: str, prefix: str, num_files: int, num_bytes: int, start_time):
+    elapsed = time.perf_counter() - start_time
+    rate = num_bytes / elapsed if elapsed > 0 else 0.0
+    if num_bytes:
+        MINIO_UPLOAD_THROUGHPUT.observe(rate)
+    logger.info(
+        f"Uploaded {num_files} files ({num_bytes / 1e6:.1f} MB) to "
+        f"{bucket}/{prefix} in {elapsed:.2f}s ({rate / 1e6:.1f} MB/s)."
+    )
+
+
+def _upload_file(bucket: str, object_name: str, file_path: str) -> int:
+    file_size = os.stat(file_path).st_size
+    with open(file_path, "rb") as file_data:
+        minio_client.put_object(bucket, object_name, data=file_data, length=file_size)
+    record_minio_transfer("upload", file_size)
+    logger.info(f"Created {object_name}.")
+    return file_size
+
+
+def upload_directory(
+    bucket: str, prefix: str, directory: str, workers: int = TRANSFER_WORKERS
+) -> int:
+    """
+    Upload every file under directory to bucket/prefix/<relative path>.
+    Returns the number of bytes uploaded.
+    """
+    files = []
+    for dir_path, _, file_names in os.walk(directory):
+        for file_name in file_names:
+            file_path = os.path.join(dir_path, file_name)
+            relative_path = os.path.relpath(file_path, directory).replace(os.sep, "/")
+            files.append((f"{prefix}/{relative_path}", file_path))
+
+    start_time = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        sizes = list(executor.map(lambda item: _upload_file(bucket, *item), files))
+    _report(bucket, prefix, len(files), sum(sizes), start_time)
+    return sum(sizes)
+
+
+def upload_zip_members(
+    bucket: str, prefix: str, zip_path: str, workers: int = TRANSFER_WORKERS
+) -> int:
+    """
+    Stream every file in the archive at zip_path to bucket/prefix/<member
+    name> without extracting it to disk. Returns the number of bytes uploaded.
+    """
+    with zipfile.ZipFile(zip_path) as zip_file:
+        members = [member for member in zip_file.infolist() if not member.is_dir()]
+
+    # ZipFile reads are not safe to interleave, so each thread opens its own
+    local = threading.local()
+    archives = []
+
+    def upload_member(member: zipfile.ZipInfo) -> int:
+        if not hasattr(local, "archive"):
+            local.archive = zipfile.ZipFile(zip_path)
+            archives.append(local.archive)
+        object_name = f"{prefix}/{member.filename}"
+        with local.archive.open(member) as member_data:
+            minio_client.put_object(
+                bucket, object_name, data=member_data, length=member.file_size
+            )
+        record_minio_transfer("upload", member.file_size)
+        logger.info(f"Created {object_name}.")
+        return member.file_size
+
+    start_time = time.perf_counter()
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            sizes = list(executor.map(upload_member, members))
+    finally:
+        for archive in archives:
+            archive.close()
+    _report(bucket, prefix, len(members), sum(sizes), start_time)
+    return sum(sizes)
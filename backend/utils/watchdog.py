@@ -0,0 +1,95 @@
+import os
+import logging
+import docker
+from models.schema import TestResult
+from utils.database import session_scope
+from utils.docker import docker_client
+
+# Wall-time (seconds) and memory budgets per container stage. Override with
+# WATCHDOG_<STAGE>_TIMEOUT / WATCHDOG_<STAGE>_MEMORY, e.g. WATCHDOG_ENCODE_TIMEOUT=300
+DEFAULT_BUDGETS = {
+    "encode": (600, "8g"),
+    "decode": (600, "8g"),
+    "deconstruct": (1800, "8g"),
+    "reconstruct": (1800, "8g"),
+    "search": (7200, "32g"),
+    "compare": (600, "4g"),
+}
+
+SUBMISSION_LABEL = "mecs.submission"
+
+# Cores reserved for timed stages (docker --cpuset-cpus syntax, e.g. "2-3"),
+# kept free of other work on the node so timings are comparable.
+TIMED_CPUSET = os.environ.get("TIMED_CPUSET")
+TIMED_STAGES = ("encode", "decode")
+
+logger = logging.getLogger(__name__)
+
+
+class ContainerTimeout(Exception):
+    status = "timeout"
+
+    def __init__(self, stage_name: str, timeout: float):
+        super().__init__(f"{stage_name} container exceeded {timeout}s")
+
+
+class ContainerOOM(Exception):
+    status = "oom"
+
+    def __init__(self, stage_name: str, mem_limit: str):
+        super().__init__(f"{stage_name} container exceeded {mem_limit} of memory")
+
+
+class BenchmarkCancelled(Exception):
+    status = "cancelled"
+
+
+def stage_budget(stage_name: str) -> tuple[float, str]:
+    timeout, mem_limit = DEFAULT_BUDGETS[stage_name]
+    prefix = f"WATCHDOG_{stage_name.upper()}"
+    return (
+        float(os.environ.get(f"{prefix}_TIMEOUT", timeout)),
+        os.environ.get(f"{prefix}_MEMORY", mem_limit),
+    )
+
+
+def create_host_config(stage_name: str, **kwargs):
+    # No swap on top of the memory budget, so exceeding it is an OOM kill
+    _, mem_limit = stage_budget(stage_name)
+    if TIMED_CPUSET and stage_name in TIMED_STAGES:
+        kwargs.setdefault("cpuset_cpus", TIMED_CPUSET)
+    return docker_client.create_host_config(
+        mem_limit=mem_limit, memswap_limit=mem_limit, **kwargs
+    )
+
+
+def submission_labels(submission_id: str | None) -> dict:
+    return {SUBMISSION_LABEL: submission_id} if submission_id else {}
+
+
+def is_cancelled(submission_id: str | None) -> bool:
+    if not submission_id:
+        return False
+    with session_scope() as db_session:
+        test_result = (
+            db_session.query(TestResult).filter_by(submission_id=submission_id).first()
+        )
+        return test_result is not None and test_result.status == "cancelled"
+
+
+def kill_submission_containers(submission_id: str) -> int:
+    """
+    Kill and remove every container started for the submission. Returns the
+    number of containers killed.
+    """
+    containers = docker_client.containers(
+        all=True, filters={"label": f"{SUBMISSION_LABEL}={submission_id}"}
+    )
+    for container in containers:
+        try:
+            docker_client.remove_container(container=container["Id"], force=True)
+        except docker.errors.NotFound:
+            pass
+        except docker.errors.APIError as e:
+            logger.error(f"Failed to kill container {container['Id']}: {e}")
+    return len(containers)
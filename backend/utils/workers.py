@@ -0,0 +1,195 @@
+import os
+import math
+import time
+import logging
+from celery.utils.nodenames import WORKER_DIRECT_EXCHANGE
+from celery.worker import state
+from celery.worker.autoscale import Autoscaler
+from docker.utils import parse_bytes
+from prometheus_client import REGISTRY, CollectorRegistry, multiprocess
+from utils.telemetry import PROMETHEUS_MULTIPROC_DIR
+from utils.watchdog import stage_budget
+
+# What this node is provisioned for: "timed" (isolated cores for encode/decode
+# timing), "search" (memory for MSFragger) and "default" (light tasks). When
+# unset, a worker is tagged with the queues it consumes once it starts (see
+# derive_capabilities); other processes have none.
+CAPABILITIES = ("timed", "search", "default")
+WORKER_CAPABILITIES = set(
+    filter(None, os.environ.get("WORKER_CAPABILITIES", "").split(","))
+)
+
+# Pipeline stages (see utils.telemetry.stage) run by the tasks of each queue
+QUEUE_STAGES = {
+    "timed": ["encode_benchmark"],
+    "search": ["reconstruct", "search", "compare"],
+}
+# Seconds per stage until enough of them have been observed
+DEFAULT_STAGE_COSTS = {
+    "encode_benchmark": 300,
+    "reconstruct": 120,
+    "search": 1800,
+    "compare": 60,
+}
+DEFAULT_TASK_COST = 5
+
+# Scale so the backlog a worker consumes would drain in about this many seconds
+AUTOSCALE_TARGET_DRAIN = float(os.environ.get("AUTOSCALE_TARGET_DRAIN", 3600))
+# Seconds between queue depth and stage cost reads
+AUTOSCALE_INTERVAL = float(os.environ.get("AUTOSCALE_INTERVAL", 15))
+
+logger = logging.getLogger(__name__)
+
+
+def has_capability(capability: str) -> bool:
+    return capability in WORKER_CAPABILITIES
+
+
+def consumed_queues(app) -> list[str]:
+    # consume_from is unset when the worker was started without -Q. The
+    # worker's own direct queue only carries handoffs and is left out.
+    queues = app.amqp.queues
+    return [
+        queue_name
+        for queue_name, queue in (queues.consume_from or queues).items()
+        if queue.exchange.name != WORKER_DIRECT_EXCHANGE.name
+    ]
+
+
+def derive_capabilities(app):
+    """
+    Tag a worker started without WORKER_CAPABILITIES with the queues it
+    consumes, so it only keeps work on this node that it would run itself.
+    """
+    if os.environ.get("WORKER_CAPABILITIES"):
+        return
+    WORKER_CAPABILITIES.update(set(consumed_queues(app)) & set(CAPABILITIES))
+    logger.info(f"Worker capabilities from its queues: {WORKER_CAPABILITIES}")
+
+
+def queue_depths(app, queue_names) -> dict:
+    """
+    Number of messages waiting in each named queue. Redis deletes empty
+    lists, so a passive queue_declare fails for an empty queue; the lists a
+    queue is spread over (one per priority step) are counted instead, a
+    missing one being 0.
+    """
+    depths = {}
+    with app.connection_for_read() as connection:
+        channel = connection.default_channel
+        for queue_name in queue_names:
+            depths[queue_name] = sum(
+                channel.client.llen(channel._q_for_pri(queue_name, priority))
+                for priority in channel.priority_steps
+            )
+    return depths
+
+
+def stage_costs() -> dict:
+    """
+    Mean observed seconds per pipeline stage, from the stage latency
+    histogram shared by the processes of this worker.
+    """
+    if PROMETHEUS_MULTIPROC_DIR:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+
+    totals = {}
+    for metric in registry.collect():
+        if metric.name != "mecs_stage_duration_seconds":
+            continue
+        for sample in metric.samples:
+            stage_name = sample.labels.get("stage")
+            if sample.name.endswith("_sum"):
+                totals.setdefault(stage_name, [0.0, 0.0])[0] += sample.value
+            elif sample.name.endswith("_count"):
+                totals.setdefault(stage_name, [0.0, 0.0])[1] += sample.value
+
+    costs = dict(DEFAULT_STAGE_COSTS)
+    for stage_name, (total, count) in totals.items():
+        if count:
+            costs[stage_name] = total / count
+    return costs
+
+
+def queue_cost(queue_name: str, costs: dict) -> float:
+    stages = QUEUE_STAGES.get(queue_name)
+    if not stages:
+        return DEFAULT_TASK_COST
+    return sum(costs.get(stage_name, DEFAULT_TASK_COST) for stage_name in stages)
+
+
+def memory_capacity() -> int | None:
+    # How many MSFragger searches fit in this node's memory at once
+    try:
+        total = os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES")
+    except (ValueError, OSError):
+        return None
+    return max(1, total // parse_bytes(stage_budget("search")[1]))
+
+
+class QueueCostAutoscaler(Autoscaler):
+    """
+    Sizes the pool from the backlog instead of the prefetched requests: the
+    tasks waiting in each consumed queue times the historical cost of the
+    stages they run, spread over AUTOSCALE_TARGET_DRAIN seconds. Bounded by
+    --autoscale and, on timed nodes, to a single process so timings are not
+    disturbed. Only the search slots are bounded by the memory available for
+    searches; the cap is enforced only where search has a worker of its own.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._desired = None
+        self._checked_at = 0.0
+
+    def _is_search(self, request) -> bool:
+        task = self.worker.app.tasks.get(request.task_name)
+        return getattr(task, "queue", None) == "search"
+
+    def _compute_desired(self) -> int:
+        queue_names = consumed_queues(self.worker.app)
+        if "timed" in queue_names:
+            return 1
+
+        depths = queue_depths(self.worker.app, queue_names)
+        costs = stage_costs()
+        backlog = {
+            queue_name: depth * queue_cost(queue_name, costs)
+            for queue_name, depth in depths.items()
+        }
+        search_active = sum(
+            1 for request in state.active_requests if self._is_search(request)
+        )
+        search_slots = search_active + math.ceil(
+            backlog.pop("search", 0) / AUTOSCALE_TARGET_DRAIN
+        )
+        if "search" in queue_names:
+            capacity = memory_capacity()
+            if capacity is not None:
+                search_slots = min(search_slots, max(capacity, search_active))
+        other_slots = (
+            len(state.active_requests)
+            - search_active
+            + math.ceil(sum(backlog.values()) / AUTOSCALE_TARGET_DRAIN)
+        )
+        desired = search_slots + other_slots
+        logger.debug(
+            f"Autoscaler backlog {depths}, want {search_slots} search and "
+            f"{other_slots} other processes"
+        )
+        return desired
+
+    @property
+    def qty(self):
+        now = time.monotonic()
+        if self._desired is None or now - self._checked_at > AUTOSCALE_INTERVAL:
+            self._checked_at = now
+            try:
+                self._desired = self._compute_desired()
+            except Exception as e:
+                logger.error(f"Autoscaler failed to read the backlog: {e}")
+                self._desired = len(state.reserved_requests)
+        return self._desired
@@ -40,6 +40,13 @@ export function RankingTable({ columns, data }: DataTableProps) {
     },
   });
 
+  // Reference codecs stay pinned above the submissions whatever the sorting
+  const rows = table.getRowModel().rows;
+  const pinnedRows = [
+    ...rows.filter((row) => row.original.baseline),
+    ...rows.filter((row) => !row.original.baseline),
+  ];
+
   return (
     <div className="rounded-md border">
       <Table>
@@ -62,11 +69,15 @@ export function RankingTable({ columns, data }: DataTableProps) {
           ))}
         </TableHeader>
         <TableBody>
-          {table.getRowModel().rows?.length ? (
-            table.getRowModel().rows.map((row) => (
+          {pinnedRows.length ? (
+            pinnedRows.map((row) => (
               <TableRow
                 key={row.id}
-                className="cursor-pointer"
+                className={
+                  row.original.baseline
+                    ? "cursor-pointer bg-muted/50 italic"
+                    : "cursor-pointer"
+                }
                 onClick={() =>
                   navigate(`/submission/${row.original.submission_id}`)
                 }
@@ -160,6 +160,14 @@ export const Submission = () => {
                     {resultData?.status === "failed" && (
                       <IoCloseCircle className="text-red-400 text-3xl" />
                     )}
+                    {["timeout", "oom", "cancelled"].includes(
+                      resultData?.status ?? ""
+                    ) && (
+                      <>
+                        <IoCloseCircle className="text-red-400 text-3xl" />
+                        <p className="my-auto">{resultData?.status}</p>
+                      </>
+                    )}
                     {resultData?.status === "pending" && (
                       <IoTime className="text-yellow-400 text-3xl" />
                     )}
@@ -212,7 +212,9 @@ export const columns: ColumnDef<Result>[] = [
           {value === "success" && (
             <IoCheckmarkCircle className="text-green-400 text-3xl m-auto" />
           )}
-          {value === "error" && (
+          {["error", "failed", "timeout", "oom", "cancelled"].includes(
+            value as string
+          ) && (
             <IoCloseCircle className="text-red-400 text-3xl m-auto" />
           )}
           {value === "pending" && (
@@ -16,10 +16,18 @@ export type Result = {
     decoding_runtime: number | null
     ratio: number | null
     accuracy: number | null
-    status: "pending" | "success" | "failed"
+    status: "pending" | "success" | "failed" | "timeout" | "oom" | "cancelled"
     peptide_percent_preserved: number | null
     peptide_percent_missed: number | null
     peptide_percent_new: number | null
+    dataset: string | null
+    encoding_throughput: number | null
+    decoding_throughput: number | null
+    bits_per_point: number | null
+    mz_bits_per_point: number | null
+    intensity_bits_per_point: number | null
+    efficiency: number | null
+    baseline: boolean
 }
 
 export type Rank = {